@@ -0,0 +1,229 @@
+"""
+Headless ramp extraction over a folder of images.
+
+    python batch_extract.py <input_dir> [-c config.json] [-o output_dir] [-j workers]
+
+Every image gets a `<name>_ramps.json` next to it (or in the output directory), in the
+same format as File > Export Color Data; with --format npz, a `<name>_ramps.npz`
+project. The config is a JSON file overriding any part of DEFAULT_CONFIG; run with
+--print-config to get a template.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import core
+
+IMAGE_EXTENSIONS = (".png", ".gif", ".bmp", ".jpg", ".jpeg")
+
+# Mirrors the defaults of the Graph and Ramp Extraction panels
+DEFAULT_CONFIG = {
+    "quantize": {
+        "max_colors": None,
+        "method": "K-means"
+    },
+    "graph": {
+        "type": "Spatial Adjacency Graph",
+        "use_8_neighbors": False,
+        "spatial_method": "Relative to color frequency",
+        "spatial_threshold": 50,
+        "color_method": "CIEDE2000",
+        "color_threshold": 30,
+        "hsv_thresholds": [30, 0.3, 0.3],
+        "combination": "Union"
+    },
+    "extraction": {
+        "method": "Basic HSV",
+        "params": {
+            "Basic HSV": {
+                "max_step": [90, 0.5, 0.5],
+                "min_step": [0, 0.0, 0.0],
+                "step_tolerance": [20, 0.2, 0.2],
+                "strict_monotony": [False, False, False]
+            },
+            "CIEDE2000": {
+                "min_step": 5,
+                "max_step": 30,
+                "step_tolerance": 10,
+                "angle_tolerance": 45
+            }
+        },
+        "max_length": 20,
+        "skip_subsequences": True,
+        "skip_reverse": True,
+        "skip_permutations": False,
+        "remove_similar": False,
+        "time_limit": None,
+        "max_candidates": None
+    }
+}
+
+
+def merge_config(base, overrides):
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_config(path=None):
+    if not path:
+        return copy.deepcopy(DEFAULT_CONFIG)
+    with open(path, "r") as f:
+        return merge_config(DEFAULT_CONFIG, json.load(f))
+
+
+def build_graph(palette, config):
+    graph_type = config["type"]
+    graphs = []
+
+    if graph_type in ("Spatial Adjacency Graph", "Hybrid Graph (Spatial + Color)"):
+        pair_counts, color_counts = core.adjacent_color_pairs_frames(palette.frames, config["use_8_neighbors"])
+        graphs.append(core.build_spatial_graph(
+            pair_counts, color_counts, config["spatial_method"], config["spatial_threshold"]
+        ))
+
+    if graph_type in ("Color Similarity Graph", "Hybrid Graph (Spatial + Color)"):
+        candidate_pairs = core.all_color_pairs(range(len(palette)))
+        graphs.append(core.build_color_graph(
+            palette.colors, candidate_pairs, config["color_method"], config["color_threshold"],
+            tuple(config["hsv_thresholds"])
+        ))
+
+    if not graphs:
+        raise ValueError(f"Unknown graph type: {graph_type}")
+    if len(graphs) == 2:
+        return core.combine_graphs(graphs[0], graphs[1], config["combination"])
+    return graphs[0]
+
+
+def color_data(palette, ramps):
+    """Same layout as MainWindow.export_color_data."""
+    data = {
+        'header': core.project_header(palette),
+        'ramps': [],
+        'colors': {}
+    }
+    for color_id, (color, positions) in enumerate(zip(palette.colors, palette.pixel_positions())):
+        data['colors'][str(color_id)] = {
+            'color': tuple(int(x) for x in color),
+            'positions': list(positions)
+        }
+    data['ramps'] = [[int(color_id) for color_id in ramp] for ramp in ramps]
+    return data
+
+
+def process_image(image_path, output_path, config):
+    # Animated GIFs get ramps that hold across all of their frames
+    palette, _ = core.load_animation(image_path)
+    quantize = config["quantize"]
+    if quantize["max_colors"]:
+        palette, _ = core.quantize(palette, quantize["max_colors"], quantize["method"])
+    graph = build_graph(palette, config["graph"])
+
+    extraction = config["extraction"]
+    method = extraction["method"]
+    ramps, _, budget = core.run_extraction(
+        graph, palette.colors, method, extraction["params"][method],
+        max_length=extraction["max_length"],
+        skip_subsequences=extraction["skip_subsequences"],
+        skip_reverse=extraction["skip_reverse"],
+        skip_permutations=extraction["skip_permutations"],
+        remove_similar=extraction["remove_similar"],
+        time_limit=extraction["time_limit"],
+        max_candidates=extraction["max_candidates"]
+    )
+
+    if output_path.endswith(".npz"):
+        core.save_project(output_path, palette, ramps)
+    else:
+        with open(output_path, "w") as f:
+            json.dump(color_data(palette, ramps), f)
+
+    return len(palette), len(ramps), budget.stop_reason
+
+
+def find_images(input_dir, recursive=False):
+    if not recursive:
+        names = sorted(os.listdir(input_dir))
+        return [os.path.join(input_dir, name) for name in names
+                if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(input_dir, name))]
+
+    images = []
+    for root, _, names in os.walk(input_dir):
+        images.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(images)
+
+
+def output_path_for(image_path, input_dir, output_dir=None, extension=".json"):
+    name = os.path.splitext(os.path.basename(image_path))[0] + "_ramps" + extension
+    if output_dir is None:
+        return os.path.join(os.path.dirname(image_path), name)
+    relative_dir = os.path.relpath(os.path.dirname(image_path), input_dir)
+    return os.path.join(output_dir, relative_dir, name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract color ramps from every image in a folder.")
+    parser.add_argument("input_dir", nargs="?", help="folder with the images to process")
+    parser.add_argument("-c", "--config", help="JSON file overriding the default parameters")
+    parser.add_argument("-o", "--output-dir", help="where to write the *_ramps files (default: next to each image)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("-f", "--format", choices=["json", "npz"], default="json",
+                        help="legacy JSON with position lists, or the compact npz project (default: json)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also process images in subfolders")
+    parser.add_argument("--skip-existing", action="store_true", help="skip images that already have a ramps file")
+    parser.add_argument("--print-config", action="store_true", help="print the default config and exit")
+    args = parser.parse_args(argv)
+
+    if args.print_config:
+        print(json.dumps(DEFAULT_CONFIG, indent=4))
+        return 0
+    if not args.input_dir:
+        parser.error("input_dir is required")
+
+    config = load_config(args.config)
+
+    jobs = []
+    for image_path in find_images(args.input_dir, args.recursive):
+        output_path = output_path_for(image_path, args.input_dir, args.output_dir, "." + args.format)
+        if args.skip_existing and os.path.exists(output_path):
+            continue
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        jobs.append((image_path, output_path))
+
+    if not jobs:
+        print("No images to process.")
+        return 0
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(process_image, image_path, output_path, config): image_path
+            for image_path, output_path in jobs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            image_path = futures[future]
+            try:
+                color_count, ramp_count, stop_reason = future.result()
+            except Exception:
+                failures += 1
+                print(f"[{done}/{len(jobs)}] {image_path}: failed")
+                traceback.print_exc()
+                continue
+            note = f" ({stop_reason} reached)" if stop_reason else ""
+            print(f"[{done}/{len(jobs)}] {image_path}: {color_count} colors, {ramp_count} ramps{note}")
+
+    print(f"Processed {len(jobs) - failures} of {len(jobs)} images.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Per-stage timings of the extraction pipeline over the bundled images.
+
+    python benchmark.py [images...] [-p preset ...] [-o results.json]
+                        [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Every image is run with every preset. The stages (load, adjacency, similarity matrix,
+graph build, ramp search, scoring, filters, clustering) are timed separately, the best
+of --repeat runs is kept, and the results are written as JSON. With --baseline, stages
+that got slower than the stored results by more than --tolerance are reported and the
+exit code is 1.
+
+With --check-clustering, the sparse clustering of every run is also compared with
+average linkage over the full distance matrix (core.clustering.cluster_ramp_matrix),
+for runs with at most --check-max-ramps ramps; any difference fails the run.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import core
+from batch_extract import DEFAULT_CONFIG, merge_config, build_graph
+from core.clustering import remove_similar_ramps, cluster_ramp_matrix
+from core.scoring import build_similarity_lookup, ramp_edit_distance
+from core.search import SearchBudget, remove_subsequences, remove_permutations, remove_reverses
+
+DEFAULT_IMAGES = ["resources/*.png", "resources/character/*.png"]
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+# Overrides of batch_extract.DEFAULT_CONFIG
+PRESETS = {
+    "spatial-hsv": {},
+    "spatial-ciede2000": {
+        "extraction": {"method": "CIEDE2000"}
+    },
+    "hybrid-ciede2000-clustered": {
+        "graph": {"type": "Hybrid Graph (Spatial + Color)"},
+        "extraction": {"method": "CIEDE2000", "remove_similar": True}
+    },
+}
+
+STAGES = ["load", "adjacency", "similarity_matrix", "graph", "search", "scoring", "filters", "clustering"]
+
+
+class StageTimer:
+    def __init__(self):
+        self.times = {}
+
+    def time(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.times[stage] = time.perf_counter() - start
+        return result
+
+
+def dense_clustering_matches(ramps, colors, labels, distance_threshold=2, similarity_threshold=10):
+    """Whether `labels` from remove_similar_ramps equal average linkage over the full distance matrix."""
+    similarity = build_similarity_lookup(ramps, colors, similarity_threshold)
+    n = len(ramps)
+    distances = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            distances[i, j] = distances[j, i] = ramp_edit_distance(ramps[i], ramps[j], similarity=similarity)
+    return np.array_equal(labels, cluster_ramp_matrix(distances, distance_threshold))
+
+
+def run_pipeline(image_path, config, max_candidates, time_limit, max_colors=None, check_max_ramps=None):
+    """
+    One pass over all stages. Returns the stage timings and a few sizes, or None for
+    the timings when the image has more than `max_colors` colors. With
+    `check_max_ramps`, clusterings of at most that many ramps are checked against the
+    dense path and the result is in info["clustering_matches"].
+    """
+    timer = StageTimer()
+    clustering_matches = None
+    extraction = config["extraction"]
+    method = extraction["method"]
+
+    palette = timer.time("load", core.load_palette, image_path)
+    if max_colors is not None and len(palette) > max_colors:
+        return None, {"colors": len(palette)}
+
+    timer.time("adjacency", core.adjacent_color_pairs, palette.labels, config["graph"]["use_8_neighbors"])
+    timer.time("similarity_matrix", core.ciede2000_similarity_matrix, palette.colors, config["graph"]["color_threshold"])
+    graph = timer.time("graph", build_graph, palette, config["graph"])
+
+    budget = SearchBudget(time_limit, max_candidates)
+    stats = core.Stats("benchmark")
+    ramps = timer.time("search", lambda: list(core.iter_color_ramps(
+        graph, palette.colors, method, extraction["params"][method], extraction["max_length"],
+        budget=budget, stats=stats
+    )))
+
+    ramp_scores = timer.time("scoring", lambda: [
+        (ramp, core.evaluate_ramp_quality([palette.colors[color_id] for color_id in ramp])['final_score'])
+        for ramp in ramps
+    ])
+
+    def apply_filters(scores):
+        if extraction["skip_subsequences"]:
+            scores = remove_subsequences(scores)
+        if extraction["skip_permutations"]:
+            scores = remove_permutations(scores)
+        if extraction["skip_reverse"] and not extraction["skip_permutations"]:
+            scores = remove_reverses(scores)
+        return [ramp for ramp, _ in scores]
+
+    final_ramps = timer.time("filters", apply_filters, ramp_scores)
+
+    if extraction["remove_similar"] and len(final_ramps) > 2:
+        clustered_ramps, labels = timer.time("clustering", remove_similar_ramps, final_ramps, palette.colors, stats=stats)
+        if check_max_ramps is not None and len(final_ramps) <= check_max_ramps:
+            clustering_matches = dense_clustering_matches(final_ramps, palette.colors, labels)
+        final_ramps = clustered_ramps
+    else:
+        timer.times["clustering"] = 0.0
+
+    info = {
+        "colors": len(palette),
+        "pixels": int(palette.labels.size),
+        "edges": graph.number_of_edges(),
+        "candidates": len(ramps),
+        "ramps": len(final_ramps),
+        "search_stopped": budget.stop_reason,
+        "counters": dict(stats.counters),
+    }
+    if clustering_matches is not None:
+        info["clustering_matches"] = clustering_matches
+    return timer.times, info
+
+
+def benchmark(image_paths, preset_names, repeat=3, max_colors=256, max_candidates=2000, time_limit=30,
+              check_max_ramps=None):
+    results = {}
+    for image_path in image_paths:
+        for preset_name in preset_names:
+            key = f"{image_path}::{preset_name}"
+            config = merge_config(DEFAULT_CONFIG, PRESETS[preset_name])
+
+            best, info = None, None
+            for _ in range(repeat):
+                times, info = run_pipeline(image_path, config, max_candidates, time_limit, max_colors, check_max_ramps)
+                if times is None:
+                    break
+                best = times if best is None else {stage: min(best[stage], times[stage]) for stage in times}
+
+            if best is None:
+                print(f"{key}: skipped, {info['colors']} colors (limit {max_colors})")
+                break
+
+            best["total"] = sum(best[stage] for stage in STAGES)
+            results[key] = {"info": info, "seconds": best}
+            print(f"{key}: {best['total'] * 1000:.1f} ms "
+                  f"({info['colors']} colors, {info['candidates']} candidates, {info['ramps']} ramps)")
+    return results
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.005):
+    """Stages slower than the baseline by more than `tolerance` (ratio) and `min_seconds`."""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for stage, seconds in result["seconds"].items():
+            before = baseline[key]["seconds"].get(stage)
+            if before is None:
+                continue
+            if seconds - before > min_seconds and seconds > before * (1 + tolerance):
+                regressions.append((key, stage, before, seconds))
+    return regressions
+
+
+def find_images(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if any(c in pattern for c in "*?[") else [pattern]
+        paths.extend(path for path in matches if os.path.isfile(path))
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of ramp extraction.")
+    parser.add_argument("images", nargs="*", help=f"images or glob patterns (default: {' '.join(DEFAULT_IMAGES)})")
+    parser.add_argument("-p", "--preset", action="append", choices=sorted(PRESETS),
+                        help="preset to run, can be repeated (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="runs per image and preset, the fastest is kept")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown per stage (0.25 = 25%%)")
+    parser.add_argument("--max-colors", type=int, default=256, help="skip images with more colors than this")
+    parser.add_argument("--max-candidates", type=int, default=2000, help="candidate budget of the ramp search")
+    parser.add_argument("--time-limit", type=float, default=30, help="time budget of the ramp search in seconds")
+    parser.add_argument("--check-clustering", action="store_true",
+                        help="compare the sparse clustering with the dense path")
+    parser.add_argument("--check-max-ramps", type=int, default=300,
+                        help="largest number of ramps to check the clustering of")
+    args = parser.parse_args(argv)
+
+    image_paths = find_images(args.images or DEFAULT_IMAGES)
+    if not image_paths:
+        print("No images found.")
+        return 1
+
+    results = benchmark(
+        image_paths, args.preset or list(PRESETS), args.repeat,
+        args.max_colors, args.max_candidates, args.time_limit,
+        args.check_max_ramps if args.check_clustering else None
+    )
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "repeat": args.repeat,
+            "max_candidates": args.max_candidates,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.check_clustering:
+        mismatches = [key for key, result in results.items() if result["info"].get("clustering_matches") is False]
+        for key in mismatches:
+            print(f"CLUSTERING MISMATCH {key}: sparse and dense clustering differ")
+        checked = sum("clustering_matches" in result["info"] for result in results.values())
+        print(f"{len(mismatches)} clustering mismatches in {checked} checked runs")
+        if mismatches:
+            return 1
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for key, stage, before, after in regressions:
+        print(f"REGRESSION {key} {stage}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+    print(f"{len(regressions)} regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+"""
+Qt-free color ramp extraction.
+
+Everything here takes its inputs explicitly: a Palette (or any mapping from color id
+to RGBA) instead of the global color manager, so it runs without a display and in
+worker processes.
+"""
+from .adjacency import adjacent_color_pairs, adjacent_color_pairs_frames
+from .clustering import remove_similar_ramps
+from .graph import build_spatial_graph, build_color_graph, combine_graphs, all_color_pairs
+from .image_io import load_palette, load_animation, save_animation, palette_from_image
+from .palette import Palette
+from .pipeline import run_extraction
+from .project import load_project, save_project, project_header, headers_match, read_color_data
+from .quantize import QUANTIZE_METHODS, quantize
+from .scoring import evaluate_ramp_quality, ramp_edit_distance
+from .search import SearchBudget, StreamingRampFilter, iter_color_ramps, find_color_ramps, is_valid_ramp
+from .stats import Stats
+from .similarity import (
+    color_to_hsv, color_to_lab, colors_to_lab, hsv_diffs, is_similar_hsv, is_similar_ciede2000, ciede2000_similarity_matrix
+)
@@ -0,0 +1,58 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def adjacent_color_pairs(labels, use_8_neighbors=True):
+    """
+    Count how often two different colors touch in a label map.
+
+    Returns a dict mapping sorted color id pairs to the number of neighbouring pixel
+    pairs, and a dict with the pixel count of every color id. Transparent pixels
+    (label -1) are skipped.
+    """
+    height, width = labels.shape
+    offsets = [(0, 1), (1, 0)]
+    if use_8_neighbors:
+        offsets += [(1, 1), (1, -1)]
+
+    color_count = int(labels.max()) + 1 if labels.size else 0
+    pair_keys = []
+    for dy, dx in offsets:
+        # Each pixel against its neighbour at (y + dy, x + dx), for all pixels at once
+        first = labels[:height - dy, max(0, -dx):width - max(0, dx)]
+        second = labels[dy:, max(0, dx):width - max(0, -dx)]
+
+        touching = (first >= 0) & (second >= 0) & (first != second)
+        low = np.minimum(first[touching], second[touching]).astype(np.int64)
+        high = np.maximum(first[touching], second[touching]).astype(np.int64)
+        pair_keys.append(low * color_count + high)
+
+    keys, counts = np.unique(np.concatenate(pair_keys) if pair_keys else np.zeros(0, np.int64), return_counts=True)
+    adjacency_counts = {
+        (int(key // color_count), int(key % color_count)): int(count)
+        for key, count in zip(keys, counts)
+    }
+
+    pixel_counts = np.bincount(labels[labels >= 0], minlength=color_count)
+    id_counts = {color_id: int(count) for color_id, count in enumerate(pixel_counts) if count}
+
+    return adjacency_counts, id_counts
+
+
+def adjacent_color_pairs_frames(frames, use_8_neighbors=True, max_workers=None):
+    """
+    adjacent_color_pairs summed over a stack of label maps, e.g. the frames of an
+    animation. Pixels only touch within their own frame. Frames are counted in
+    parallel threads; numpy releases the GIL for the heavy parts.
+    """
+    if len(frames) == 1:
+        return adjacent_color_pairs(frames[0], use_8_neighbors)
+
+    adjacency_counts, id_counts = Counter(), Counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for pairs, counts in executor.map(lambda labels: adjacent_color_pairs(labels, use_8_neighbors), frames):
+            adjacency_counts.update(pairs)
+            id_counts.update(counts)
+    return dict(adjacency_counts), dict(id_counts)
@@ -0,0 +1,219 @@
+import heapq
+import math
+
+import numpy as np
+
+from .scoring import build_similarity_lookup, evaluate_ramp_quality, ramp_edit_distance
+from .similarity import color_to_hsv
+
+
+def remove_similar_ramps(ramps, colors, distance_threshold=2, similarity_threshold=10, progress=None, stats=None):
+    """Cluster near-duplicate ramps and keep the best of each. Returns the kept ramps and the cluster labels."""
+    if not ramps:
+        return ramps, np.zeros(0, dtype=int)
+
+    similarity = build_similarity_lookup(ramps, colors, similarity_threshold)
+
+    if progress:
+        progress("Finding Similar Ramps...", 0, 0)
+    candidate_pairs = find_candidate_ramp_pairs(ramps, similarity, distance_threshold, progress=progress)
+    if stats is not None:
+        stats.count("clustering: candidate pairs", len(candidate_pairs))
+
+    # Only pairs below the threshold become edges, so the DP can stop early
+    edges = {}
+    total_pairs = len(candidate_pairs)
+    for pair_count, (i, j) in enumerate(candidate_pairs, start=1):
+        if progress:
+            progress("Computing Distances...", pair_count, total_pairs)
+        dist = ramp_edit_distance(ramps[i], ramps[j], similarity=similarity, max_distance=distance_threshold)
+        if dist < distance_threshold:
+            edges[(i, j)] = dist
+    if stats is not None:
+        stats.count("clustering: close pairs", len(edges))
+
+    if progress:
+        progress("Clustering...", 0, 0)
+    labels = cluster_ramp_graph(
+        len(ramps), edges, distance_threshold,
+        lambda i, j: ramp_edit_distance(ramps[i], ramps[j], similarity=similarity)
+    )
+
+    # Select the best ramp from each cluster
+    final_ramps = []
+    for label in np.unique(labels):
+        indices = np.where(labels == label)[0]
+        candidate_ramps = [ramps[i] for i in indices]
+        best_ramp = select_best_ramp(candidate_ramps, colors)
+        final_ramps.append(best_ramp)
+
+    # Sort final ramps by brightness of the first color (V in HSV)
+    final_ramps.sort(key=lambda r: color_to_hsv(colors[r[0]])[2])
+
+    return final_ramps, labels
+
+
+def find_candidate_ramp_pairs(ramps, similarity, distance_threshold, block_size=512, progress=None):
+    """
+    Index pairs (i, j), i < j, of ramps whose edit distance may be below `distance_threshold`.
+
+    A color with no similar counterpart in the other ramp costs at least one insertion
+    or substitution, and so does each color of length difference. The number of matched
+    colors for every pair is a product of the ramp/color incidence matrix, computed in
+    row blocks so memory grows linearly with the number of ramps.
+    """
+    similar, index = similarity
+    n = len(ramps)
+    max_unmatched = math.ceil(distance_threshold) - 1
+
+    incidence = np.zeros((n, len(index)), dtype=np.float32)
+    for i, ramp in enumerate(ramps):
+        incidence[i, [index[c] for c in ramp]] = 1
+    lengths = np.array([len(ramp) for ramp in ramps], dtype=np.float32)
+
+    # has_similar[r, c]: ramp r contains a color similar to color c
+    has_similar = ((incidence @ similar.astype(np.float32)) > 0).astype(np.float32)
+
+    pairs = []
+    for start in range(0, n, block_size):
+        if progress:
+            progress("Finding Similar Ramps...", start, n)
+        stop = min(start + block_size, n)
+        block_lengths = lengths[start:stop, None]
+
+        matched = incidence[start:stop] @ has_similar.T
+        matched_back = has_similar[start:stop] @ incidence.T
+
+        close = (
+            (matched >= block_lengths - max_unmatched)
+            & (matched_back >= lengths[None, :] - max_unmatched)
+            & (np.abs(block_lengths - lengths[None, :]) <= max_unmatched)
+        )
+        rows, cols = np.nonzero(close)
+        rows += start
+        keep = rows < cols
+        pairs.extend(zip(rows[keep].tolist(), cols[keep].tolist()))
+
+    return pairs
+
+
+def cluster_ramp_graph(n, edges, distance_threshold, pair_distance):
+    """
+    Average-linkage clustering of n ramps from a sparse graph of distances.
+
+    `edges` maps index pairs (i, j) to distances below `distance_threshold`. Two
+    clusters without an edge between them average at or above the threshold and never
+    merge, so only neighbouring clusters are compared, and the distances missing
+    between them are filled in on demand with `pair_distance(i, j)`.
+
+    Edit distances are multiples of 0.5, so equal averages are common; they merge in
+    order of the lowest ramp index in either cluster. With that order the clusters are
+    exactly those of cluster_ramp_matrix over the full distance matrix.
+    """
+    members = {i: [i] for i in range(n)}
+    totals = {i: {} for i in range(n)}  # cluster -> neighbour cluster -> sum of pair distances
+    heap = []
+    for (i, j), dist in edges.items():
+        totals[i][j] = totals[j][i] = dist
+        heap.append(_merge_key(dist, i, j, i, j))
+    heapq.heapify(heap)
+
+    next_cluster = n
+    while heap:
+        average, _, _, a, b = heapq.heappop(heap)
+        if average >= distance_threshold:
+            break
+        if a not in members or b not in members:
+            continue
+
+        members_a, members_b = members.pop(a), members.pop(b)
+        totals_a, totals_b = totals.pop(a), totals.pop(b)
+        merged = next_cluster
+        next_cluster += 1
+        members[merged] = members_a + members_b
+        totals[merged] = {}
+
+        for neighbour in (totals_a.keys() | totals_b.keys()) - {a, b}:
+            total = 0.0
+            for part, part_totals in ((members_a, totals_a), (members_b, totals_b)):
+                if neighbour in part_totals:
+                    total += part_totals[neighbour]
+                else:
+                    total += sum(pair_distance(i, j) for i in part for j in members[neighbour])
+
+            neighbour_totals = totals[neighbour]
+            neighbour_totals.pop(a, None)
+            neighbour_totals.pop(b, None)
+            neighbour_totals[merged] = totals[merged][neighbour] = total
+
+            size = len(members[merged]) * len(members[neighbour])
+            heapq.heappush(heap, _merge_key(
+                total / size, min(members[merged]), min(members[neighbour]), merged, neighbour
+            ))
+
+    return _cluster_labels(n, members.values())
+
+
+def cluster_ramp_matrix(distances, distance_threshold):
+    """
+    Average linkage over a full (n, n) distance matrix, with ties merged in the same
+    order as cluster_ramp_graph. O(n³); the reference that the sparse path is checked
+    against.
+    """
+    n = len(distances)
+    members = {i: [i] for i in range(n)}
+    totals = {i: {j: float(distances[i][j]) for j in range(n) if j != i} for i in range(n)}
+
+    next_cluster = n
+    while len(members) > 1:
+        best = min(
+            _merge_key(total / (len(members[a]) * len(members[b])), min(members[a]), min(members[b]), a, b)
+            for a in members for b, total in totals[a].items() if a < b
+        )
+        average, _, _, a, b = best
+        if average >= distance_threshold:
+            break
+
+        members_a, members_b = members.pop(a), members.pop(b)
+        totals_a, totals_b = totals.pop(a), totals.pop(b)
+        merged = next_cluster
+        next_cluster += 1
+        members[merged] = members_a + members_b
+        totals[merged] = {}
+        for other in members:
+            if other == merged:
+                continue
+            total = totals_a[other] + totals_b[other]
+            for cluster in (a, b):
+                totals[other].pop(cluster)
+            totals[other][merged] = totals[merged][other] = total
+
+    return _cluster_labels(n, members.values())
+
+
+def _merge_key(average, first_a, first_b, a, b):
+    # Ties go to the pair with the lowest ramp indices, whatever the cluster ids
+    return average, min(first_a, first_b), max(first_a, first_b), a, b
+
+
+def _cluster_labels(n, clusters):
+    labels = np.zeros(n, dtype=int)
+    for label, indices in enumerate(sorted(clusters, key=min)):
+        labels[indices] = label
+    return labels
+
+
+def select_best_ramp(ramps, colors):
+    best_score = -np.inf
+    best_ramp = ramps[0]
+
+    ramp_lengths = [len(r) for r in ramps]
+
+    for ramp in ramps:
+        score_info = evaluate_ramp_quality([colors[color_id] for color_id in ramp], min(ramp_lengths))
+        score = score_info['final_score']
+        if score > best_score:
+            best_score = score
+            best_ramp = ramp
+
+    return best_ramp
@@ -0,0 +1,98 @@
+import numpy as np
+
+from .similarity import is_similar_hsv, is_similar_ciede2000
+
+
+def all_color_pairs(color_ids):
+    color_ids = list(color_ids)
+    return [(c1, c2) for i, c1 in enumerate(color_ids) for c2 in color_ids[i + 1:]]
+
+
+def calculate_relative_adjacency(pair_counts, color_counts):
+    return {
+        pair: max(
+            count / max(1, color_counts[pair[0]]),
+            count / max(1, color_counts[pair[1]])
+        )
+        for pair, count in pair_counts.items()
+    }
+
+
+def filter_adjacency_pairs(pair_counts, color_counts, method, threshold):
+    if not pair_counts:
+        return {}
+
+    if method == "Absolute":
+        return {pair: count for pair, count in pair_counts.items()
+                if count >= threshold}
+
+    elif method == "Relative to color frequency":
+        relative_counts = calculate_relative_adjacency(pair_counts, color_counts)
+        return {
+            pair: count for pair, count in pair_counts.items()
+            if relative_counts[pair] >= threshold / 100.0
+        }
+
+    elif method == "Percentile-based":
+        relative_counts = calculate_relative_adjacency(pair_counts, color_counts)
+        t_val = np.percentile(list(relative_counts.values()), threshold)
+        return {pair: count for pair, count in pair_counts.items()
+                if relative_counts[pair] >= t_val}
+
+    raise ValueError(f"Unknown spatial filtering method: {method}")
+
+
+def build_spatial_graph(pair_counts, color_counts, method, threshold):
+    import networkx as nx  # slow to import, only loaded once a graph is built
+
+    filtered_pairs = filter_adjacency_pairs(pair_counts, color_counts, method, threshold)
+
+    graph = nx.Graph()
+    for (id1, id2), count in filtered_pairs.items():
+        graph.add_edge(id1, id2)
+
+    return graph
+
+
+def build_color_graph(colors, candidate_pairs, method, threshold, hsv_thresholds=(30, 0.3, 0.3)):
+    """`colors` maps color id to RGBA; `candidate_pairs` are the id pairs to test."""
+    import networkx as nx
+    if method == "HSV":
+        hue_thresh, sat_thresh, val_thresh = hsv_thresholds
+        valid_pairs = [
+            (c1_id, c2_id) for c1_id, c2_id in candidate_pairs
+            if is_similar_hsv(colors[c1_id], colors[c2_id], hue_thresh, sat_thresh, val_thresh)
+        ]
+    elif method == "CIEDE2000":
+        valid_pairs = [
+            (c1_id, c2_id) for c1_id, c2_id in candidate_pairs
+            if is_similar_ciede2000(colors[c1_id], colors[c2_id], threshold)
+        ]
+    else:
+        raise ValueError(f"Unknown color similarity method: {method}")
+
+    graph = nx.Graph()
+    for c1_id, c2_id in valid_pairs:
+        graph.add_edge(c1_id, c2_id)
+
+    return graph
+
+
+def combine_graphs(spatial_graph, color_graph, method):
+    import networkx as nx
+
+    combined_graph = nx.Graph()
+
+    if method == "Union":
+        combined_graph.add_edges_from(spatial_graph.edges)
+        combined_graph.add_edges_from(color_graph.edges)
+    elif method == "Intersection":
+        spatial_edges = {frozenset(edge) for edge in spatial_graph.edges}
+        color_edges = {frozenset(edge) for edge in color_graph.edges}
+        common_edges = spatial_edges.intersection(color_edges)
+        for edge in common_edges:
+            combined_graph.add_edge(*tuple(edge))
+    else:
+        raise ValueError(f"Unknown combination method: {method}")
+
+    return combined_graph
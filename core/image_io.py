@@ -0,0 +1,90 @@
+import numpy as np
+from PIL import Image, ImageSequence
+
+from .palette import Palette
+
+
+def palette_entries(image):
+    """The RGBA color table of a mode "P" image, or None if it has none."""
+    raw = image.getpalette()
+    if raw is None:
+        return None
+    rgb = np.array(raw, dtype=np.uint8).reshape(-1, 3)
+    entries = np.empty((len(rgb), 4), dtype=np.uint8)
+    entries[:, :3] = rgb
+    entries[:, 3] = 255
+
+    transparency = image.info.get("transparency")
+    if isinstance(transparency, int):
+        if transparency < len(entries):
+            entries[transparency, 3] = 0
+    elif isinstance(transparency, bytes):
+        # PNG tRNS: one alpha per entry, the rest stay opaque
+        alpha = np.frombuffer(transparency, dtype=np.uint8)[:len(entries)]
+        entries[:len(alpha), 3] = alpha
+    return entries
+
+
+def palette_from_image(image):
+    """Palette of an open Pillow image, read straight from the index plane when it is indexed."""
+    if image.mode == "P":
+        entries = palette_entries(image)
+        if entries is not None:
+            return Palette.from_indexed(np.asarray(image), entries)
+    return Palette.from_image(np.array(image.convert("RGBA")))
+
+
+def load_palette(path):
+    """
+    Palette of the image file at `path`. Indexed PNGs and GIFs skip color grouping:
+    the stored indices become the labels and the file palette the color table.
+    """
+    with Image.open(path) as image:
+        return palette_from_image(image)
+
+
+def load_animation(path):
+    """
+    Palette of all frames of the file at `path`, shared by every frame, and the
+    duration of each frame in milliseconds. Still images come back as one frame.
+    """
+    with Image.open(path) as image:
+        if getattr(image, "n_frames", 1) == 1:
+            return palette_from_image(image), [image.info.get("duration", 0)]
+
+        frame_arrays, durations = [], []
+        for frame in ImageSequence.Iterator(image):
+            frame_arrays.append(np.array(frame.convert("RGBA")))
+            durations.append(frame.info.get("duration", 0))
+        return Palette.from_frames(frame_arrays), durations
+
+
+def save_animation(path, frames, colors, durations, loop=0):
+    """
+    Write the label stack `frames`, colored with `colors` (color id -> RGBA), as an
+    animated GIF. GIF has no partial transparency: pixels are either opaque or, where
+    the label is -1, transparent.
+    """
+    color_count = len(colors)
+    rgba = np.zeros((color_count + 1, 4), dtype=np.uint8)
+    rgba[:color_count] = [colors[color_id] for color_id in range(color_count)]
+
+    if color_count < 256:
+        # Color ids are already palette indices; the next free index is transparent
+        table = np.zeros((256, 3), dtype=np.uint8)
+        table[:color_count] = rgba[:color_count, :3]
+        images = []
+        for labels in frames:
+            image = Image.fromarray(np.where(labels >= 0, labels, color_count).astype(np.uint8))
+            image.putpalette(table.tobytes())
+            images.append(image)
+        options = {"transparency": color_count, "optimize": False}
+    else:
+        # Too many colors for one GIF palette, Pillow quantizes each frame
+        images = [Image.fromarray(rgba[labels]) for labels in frames]
+        options = {}
+
+    images[0].save(
+        path, format="GIF", save_all=True, append_images=images[1:],
+        duration=list(durations), loop=loop, disposal=2, **options
+    )
@@ -0,0 +1,150 @@
+import numpy as np
+
+
+class Palette:
+    """
+    The distinct opaque colors of an image and its label map.
+
+    `colors[i]` is the RGBA tuple of color id i, ids numbered in order of first
+    appearance (row by row). `labels[y, x]` is the color id of each pixel, -1 where
+    the pixel is fully transparent.
+
+    Animations share one palette across frames: `frames[k]` is the label map of frame
+    k and `labels` is the first frame. Counts, positions and bounding boxes cover all
+    frames; a still image is a single frame.
+    """
+
+    def __init__(self, colors, labels, frames=None):
+        self.colors = colors
+        self.labels = labels
+        self.frames = labels[np.newaxis] if frames is None else frames
+
+    @classmethod
+    def from_frames(cls, frame_arrays):
+        """One palette for a sequence of RGBA frames of the same size, ids numbered frame by frame."""
+        stacked = cls.from_image(np.stack(frame_arrays))
+        return cls(stacked.colors, stacked.labels[0], stacked.labels)
+
+    @classmethod
+    def from_image(cls, image_array):
+        shape = image_array.shape[:-1]
+        pixels = np.ascontiguousarray(image_array[..., :4], dtype=np.uint8).reshape(-1, 4)
+        opaque = pixels[:, 3] > 0
+
+        packed = pixels.view(np.uint32).ravel()
+        unique, first_index, inverse = np.unique(packed[opaque], return_index=True, return_inverse=True)
+
+        # np.unique sorts by value; renumber by first appearance instead
+        order = np.argsort(first_index)
+        ids = np.empty(len(unique), dtype=np.int32)
+        ids[order] = np.arange(len(unique), dtype=np.int32)
+
+        labels = np.full(len(pixels), -1, dtype=np.int32)
+        labels[opaque] = ids[inverse.ravel()]
+
+        opaque_pixels = pixels[opaque]
+        colors = [tuple(int(c) for c in opaque_pixels[first_index[k]]) for k in order]
+        return cls(colors, labels.reshape(shape))
+
+    @classmethod
+    def from_indexed(cls, indices, entries, chunk_rows=64):
+        """
+        Palette of an indexed image: `indices` is its (height, width) index plane and
+        `entries` the (m, 4) RGBA color table. Gives the same ids and labels as
+        from_image on the decoded pixels without grouping them: duplicate entries
+        merge into one color, unused ones are dropped and alpha 0 entries become -1.
+        """
+        indices = np.asarray(indices)
+        entries = np.ascontiguousarray(entries, dtype=np.uint8).reshape(-1, 4)
+        flat = indices.ravel()
+        if flat.size == 0:
+            return cls([], np.full(indices.shape, -1, dtype=np.int32))
+
+        # Indices past the end of the table decode as opaque black
+        size = max(len(entries), int(flat.max()) + 1)
+        if size > len(entries):
+            padding = np.zeros((size - len(entries), 4), dtype=np.uint8)
+            padding[:, 3] = 255
+            entries = np.concatenate([entries, padding])
+
+        used = np.bincount(flat, minlength=size) > 0
+        wanted = used & (entries[:, 3] > 0)
+
+        # First pixel of each used entry; most palettes are complete after a few rows
+        first = np.full(size, flat.size, dtype=np.int64)
+        width = indices.shape[1] if indices.ndim == 2 else flat.size
+        step = max(1, chunk_rows) * width
+        missing = int(wanted.sum())
+        for start in range(0, flat.size, step):
+            if not missing:
+                break
+            values, offsets = np.unique(flat[start:start + step], return_index=True)
+            new = values[first[values] == flat.size]
+            first[new] = offsets[first[values] == flat.size] + start
+            missing -= int(wanted[new].sum())
+
+        # Entries with the same RGBA are one color, first seen at the earliest of them
+        packed = entries.view(np.uint32).ravel()
+        entry_ids = np.nonzero(wanted)[0]
+        unique, inverse = np.unique(packed[entry_ids], return_inverse=True)
+        color_first = np.full(len(unique), flat.size, dtype=np.int64)
+        np.minimum.at(color_first, inverse.ravel(), first[entry_ids])
+
+        order = np.argsort(color_first, kind="stable")
+        ids = np.empty(len(unique), dtype=np.int32)
+        ids[order] = np.arange(len(unique), dtype=np.int32)
+
+        id_lut = np.full(size, -1, dtype=np.int32)
+        id_lut[entry_ids] = ids[inverse.ravel()]
+
+        unique_rgba = unique.view(np.uint8).reshape(-1, 4)
+        colors = [tuple(int(c) for c in unique_rgba[k]) for k in order]
+        return cls(colors, id_lut[indices])
+
+    def __len__(self):
+        return len(self.colors)
+
+    def to_rgba(self, frame=0):
+        """The (height, width, 4) uint8 image of one frame, transparent where labels are -1."""
+        lut = np.zeros((len(self.colors) + 1, 4), dtype=np.uint8)
+        if self.colors:
+            lut[:-1] = self.colors
+        return lut[self.frames[frame]]
+
+    def counts(self):
+        """Number of pixels of each color id."""
+        return np.bincount(self.frames[self.frames >= 0], minlength=len(self.colors))
+
+    def pixel_positions(self):
+        """The (x, y) positions of each color id in any frame, as a list of sets."""
+        frame_index, ys, xs = np.nonzero(self.frames >= 0)
+        ids = self.frames[frame_index, ys, xs]
+        order = np.argsort(ids, kind="stable")
+        xs, ys = xs[order].tolist(), ys[order].tolist()
+        ends = np.cumsum(np.bincount(ids, minlength=len(self.colors))).tolist()
+
+        positions = []
+        start = 0
+        for end in ends:
+            positions.append(set(zip(xs[start:end], ys[start:end])))
+            start = end
+        return positions
+
+    def bounding_boxes(self):
+        """
+        Bounding box of each color id over all frames as an (n, 4) array of x0, y0, x1, y1,
+        with the end coordinates exclusive. Recoloring a color only touches pixels inside its box.
+        """
+        frame_index, ys, xs = np.nonzero(self.frames >= 0)
+        ids = self.frames[frame_index, ys, xs]
+        order = np.argsort(ids, kind="stable")
+        xs, ys, ids = xs[order], ys[order], ids[order]
+
+        boxes = np.zeros((len(self.colors), 4), dtype=np.int64)
+        present = np.bincount(ids, minlength=len(self.colors)) > 0
+        starts = np.searchsorted(ids, np.nonzero(present)[0])
+        boxes[present, 0] = np.minimum.reduceat(xs, starts)
+        boxes[present, 1] = np.minimum.reduceat(ys, starts)
+        boxes[present, 2] = np.maximum.reduceat(xs, starts) + 1
+        boxes[present, 3] = np.maximum.reduceat(ys, starts) + 1
+        return boxes
@@ -0,0 +1,69 @@
+from .clustering import remove_similar_ramps
+from .scoring import evaluate_ramp_quality
+from .stats import Stats
+from .search import SearchBudget, iter_color_ramps, remove_subsequences, remove_permutations, remove_reverses
+
+
+def run_extraction(graph, colors, method, params, max_length=20, skip_subsequences=True, skip_reverse=True,
+                   skip_permutations=False, remove_similar=False, time_limit=None, max_candidates=None,
+                   progress=None, publish=None, stats=None):
+    """
+    Full extraction pipeline: search, score, filter and optionally cluster.
+
+    `colors` maps color id to RGBA. The search stops early once `time_limit` seconds have
+    passed or `max_candidates` ramps were found, and the rest of the pipeline runs on what
+    it found. Every ramp is passed to `publish` as soon as the search finds it.
+    `progress` is called throughout every stage, so raising from it cancels the
+    extraction wherever it is.
+
+    Returns the final ramps; when similar ramps were clustered, the clustered ramps with
+    their cluster labels (otherwise None); and the SearchBudget, which records why the
+    search stopped and how much of the search space it covered. Spans and counters
+    of every stage are added to `stats`.
+    """
+    if stats is None:
+        stats = Stats()
+
+    # First get all ramps without any filtering
+    budget = SearchBudget(time_limit, max_candidates)
+    ramps = []
+    with stats.span("search"):
+        for ramp in iter_color_ramps(graph, colors, method, params, max_length, progress, budget, stats):
+            ramps.append(ramp)
+            if publish:
+                publish(ramp)
+
+    # Calculate smoothness for each ramp
+    with stats.span("scoring"):
+        ramp_scores = []
+        for i, ramp in enumerate(ramps):
+            if progress:
+                progress("Scoring Ramps...", i, len(ramps))
+            ramp_scores.append((ramp, evaluate_ramp_quality([colors[color_id] for color_id in ramp])['final_score']))
+
+    # Filter results
+    if skip_subsequences:
+        with stats.span("filter: subsequences"):
+            ramp_scores = remove_subsequences(ramp_scores, progress)
+        stats.count("after subsequence filter", len(ramp_scores))
+
+    if skip_permutations:
+        with stats.span("filter: permutations"):
+            ramp_scores = remove_permutations(ramp_scores, progress)
+        stats.count("after permutation filter", len(ramp_scores))
+
+    if skip_reverse and not skip_permutations:
+        with stats.span("filter: reverses"):
+            ramp_scores = remove_reverses(ramp_scores, progress)
+        stats.count("after reverse filter", len(ramp_scores))
+
+    final_ramps = [ramp for ramp, _ in ramp_scores]
+    clusters = None
+    if len(final_ramps) > 2 and remove_similar:
+        clustered_ramps = final_ramps
+        with stats.span("clustering"):
+            final_ramps, labels = remove_similar_ramps(clustered_ramps, colors, progress=progress, stats=stats)
+        stats.count("after clustering", len(final_ramps))
+        clusters = (clustered_ramps, labels)
+
+    return final_ramps, clusters, budget
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+from .palette import Palette
+
+PROJECT_VERSION = 1
+
+
+def palette_digest(colors):
+    """Hash of the color table, in id order."""
+    return hashlib.sha256(np.array(colors, dtype=np.uint8).reshape(-1, 4).tobytes()).hexdigest()
+
+
+def image_digest(frames):
+    """Hash of the label maps: which pixels share a color, whatever that color is now."""
+    frames = np.ascontiguousarray(frames, dtype=np.int32)
+    digest = hashlib.sha256(repr(frames.shape).encode())
+    digest.update(frames.tobytes())
+    return digest.hexdigest()
+
+
+def project_header(palette):
+    """
+    What an import checks against the current image, without reading the positions
+    or labels of the file: the version plus hashes of the colors and the label maps.
+    """
+    return {
+        "version": PROJECT_VERSION,
+        "palette_digest": palette_digest(palette.colors),
+        "image_digest": image_digest(palette.frames),
+    }
+
+
+def headers_match(header, expected):
+    return all(header.get(key) == expected[key] for key in ("palette_digest", "image_digest"))
+
+
+def save_project(path, palette, ramps):
+    """
+    Write the label maps, colors and ramps of an image as an uncompressed .npz file.
+
+    Unlike the JSON export there is no per-pixel position list: positions follow from
+    the labels. Ramps are stored flat with the length of each one.
+    """
+    frames = np.asarray(palette.frames)
+    # The smallest signed type that holds every id and -1 for transparent pixels
+    label_dtype = next(dtype for dtype in (np.int8, np.int16, np.int32) if len(palette) <= np.iinfo(dtype).max + 1)
+    colors = np.array(palette.colors, dtype=np.uint8).reshape(-1, 4)
+    ramps = [[int(color_id) for color_id in ramp] for ramp in ramps]
+    header = project_header(palette)
+
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            version=np.array(PROJECT_VERSION),
+            palette_digest=np.array(header["palette_digest"]),
+            image_digest=np.array(header["image_digest"]),
+            labels=frames.astype(label_dtype),
+            colors=colors,
+            ramp_colors=np.array([color_id for ramp in ramps for color_id in ramp], dtype=np.int32),
+            ramp_lengths=np.array([len(ramp) for ramp in ramps], dtype=np.int32),
+        )
+
+
+def load_project(path, mmap=True):
+    """
+    The Palette, ramps and header saved by save_project. With `mmap`, the label maps
+    are memory-mapped from the file instead of read, so only the pixels used get loaded.
+    Files without digests have None for a header.
+    """
+    arrays = read_npz(path, mmap)
+    version = int(arrays["version"])
+    if version > PROJECT_VERSION:
+        raise ValueError(f"Project version {version} is newer than this program supports ({PROJECT_VERSION})")
+
+    frames = arrays["labels"]
+    colors = [tuple(int(c) for c in color) for color in arrays["colors"]]
+    ramp_colors = np.asarray(arrays["ramp_colors"]).tolist()
+    ramps, start = [], 0
+    for length in np.asarray(arrays["ramp_lengths"]).tolist():
+        ramps.append(ramp_colors[start:start + length])
+        start += length
+
+    header = None
+    if "palette_digest" in arrays and "image_digest" in arrays:
+        header = {
+            "version": version,
+            "palette_digest": str(arrays["palette_digest"]),
+            "image_digest": str(arrays["image_digest"]),
+        }
+    return Palette(colors, frames[0], frames), ramps, header
+
+
+def iter_json_items(f, chunk_size=1 << 16):
+    """
+    The (key, value) pairs of the JSON object in file `f`, parsed one at a time as the
+    file is read. Stopping early leaves the rest of the file unread and unparsed.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def skip(chars):
+        # Past whitespace and the given separators, reading on as needed
+        nonlocal buffer, pos, eof
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in chars):
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            buffer, pos = buffer[pos:] + f.read(chunk_size), 0
+            eof = len(buffer) == 0
+
+    def decode():
+        nonlocal buffer, pos, eof
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    pos = end
+                    return value
+            # Doubling the read keeps re-parsing a large value linear overall
+            more = f.read(max(chunk_size, len(buffer) - pos))
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+
+    skip("")
+    if buffer[pos:pos + 1] != "{":
+        raise ValueError("Expected a JSON object")
+    pos += 1
+    while True:
+        skip(",")
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of the JSON object")
+        if buffer[pos] == "}":
+            return
+        key = decode()
+        skip(":")
+        yield key, decode()
+
+
+def read_color_data(path):
+    """
+    Header, ramps and colors of a JSON color data file, reading only as far as needed:
+    exports with a header list it and the ramps before the colors with their
+    positions, which are then never parsed and come back as None. Older files have no
+    header and are read up to both their colors and ramps.
+    """
+    header = ramps = colors = None
+    with open(path, "r") as f:
+        for key, value in iter_json_items(f):
+            if key == "header":
+                header = value
+            elif key == "ramps":
+                ramps = value
+            elif key == "colors":
+                colors = value
+            if ramps is not None and (header is not None or colors is not None):
+                break
+    return header, ramps, colors
+
+
+def read_npz(path, mmap=True):
+    """
+    Every array of an .npz file by name. Members stored uncompressed (np.savez) are
+    memory-mapped when `mmap` is set; compressed ones are read normally.
+    """
+    if not mmap:
+        with np.load(path) as npz:
+            return {name: npz[name] for name in npz.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+
+            # The member's data starts after its local header, whose name and extra field vary in length
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if dtype.hasobject or not shape or 0 in shape:
+                # Scalars and empty arrays can't be memory-mapped, and are tiny anyway
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                arrays[name] = np.lib.format.read_array(f)
+            else:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                    order="F" if fortran_order else "C"
+                )
+    return arrays
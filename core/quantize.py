@@ -0,0 +1,137 @@
+import numpy as np
+
+from .palette import Palette
+from .similarity import colors_to_lab
+
+QUANTIZE_METHODS = ("K-means", "Median cut")
+
+
+def quantize(palette, max_colors, method="K-means", batch_size=4096, iterations=100, seed=0):
+    """
+    Reduce `palette` to at most `max_colors` colors by clustering its colors in Lab,
+    each weighted by its pixel count. Every cluster is drawn in the member color
+    closest to its center, so the result only uses colors of the source image.
+
+    "Median cut" splits the heaviest box of colors at its weighted median until there
+    are `max_colors` boxes; "K-means" refines those boxes with mini-batch k-means.
+
+    Returns the quantized Palette, ids numbered by first appearance as usual, and
+    `color_map`, the quantized id of every source color id: the quantized labels are
+    `color_map[palette.labels]` wherever the source labels are not -1.
+    """
+    n = len(palette)
+    if n <= max_colors:
+        return palette, np.arange(n)
+    if method not in QUANTIZE_METHODS:
+        raise ValueError(f"Unknown quantization method: {method}")
+
+    lab = colors_to_lab(palette.colors)
+    weights = palette.counts().astype(np.float64)
+    assignment = median_cut(lab, weights, max_colors)
+    if method == "K-means":
+        centers = _weighted_means(lab, weights, assignment, max_colors)
+        centers = mini_batch_kmeans(lab, weights, centers, batch_size, iterations, np.random.default_rng(seed))
+        assignment = nearest_center(lab, centers)
+
+    return _quantized_palette(palette, lab, weights, assignment, max_colors)
+
+
+def median_cut(lab, weights, box_count):
+    """Cluster index of every color after splitting the color space into `box_count` boxes."""
+    def measured(box):
+        # Largest weighted spread along the box's widest axis goes first
+        if len(box) < 2:
+            return -1.0, 0, box
+        extent = lab[box].max(axis=0) - lab[box].min(axis=0)
+        axis = int(np.argmax(extent))
+        return extent[axis] * weights[box].sum(), axis, box
+
+    boxes = [measured(np.arange(len(lab)))]
+    while len(boxes) < box_count:
+        index = max(range(len(boxes)), key=lambda i: boxes[i][0])
+        spread, axis, box = boxes[index]
+        if spread <= 0:
+            break
+
+        box = box[np.argsort(lab[box, axis], kind="stable")]
+        cumulative = np.cumsum(weights[box])
+        split = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+        split = min(max(split, 1), len(box) - 1)
+        boxes[index] = measured(box[:split])
+        boxes.append(measured(box[split:]))
+
+    assignment = np.empty(len(lab), dtype=np.int64)
+    for cluster, (_, _, box) in enumerate(boxes):
+        assignment[box] = cluster
+    return assignment
+
+
+def mini_batch_kmeans(lab, weights, centers, batch_size=4096, iterations=100, rng=None):
+    """
+    Move `centers` towards the weighted means of their colors, one random batch of
+    colors at a time (drawn in proportion to `weights`), with a step that shrinks as
+    a center collects more samples.
+    """
+    rng = rng or np.random.default_rng()
+    centers = centers.copy()
+    seen = np.zeros(len(centers))
+    probabilities = weights / weights.sum()
+    for _ in range(iterations):
+        batch = lab[rng.choice(len(lab), size=batch_size, p=probabilities)]
+        nearest = nearest_center(batch, centers)
+
+        hits = np.bincount(nearest, minlength=len(centers)).astype(np.float64)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, nearest, batch)
+        seen += hits
+
+        hit = hits > 0
+        rate = (hits[hit] / seen[hit])[:, np.newaxis]
+        centers[hit] += (sums[hit] / hits[hit, np.newaxis] - centers[hit]) * rate
+    return centers
+
+
+def nearest_center(points, centers, chunk_size=8192):
+    """Index of the closest center (squared Euclidean distance) for every point."""
+    nearest = np.empty(len(points), dtype=np.int64)
+    center_norms = (centers ** 2).sum(axis=1)
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        distances = center_norms - 2 * chunk @ centers.T
+        nearest[start:start + chunk_size] = np.argmin(distances, axis=1)
+    return nearest
+
+
+def _weighted_means(lab, weights, assignment, cluster_count):
+    totals = np.bincount(assignment, weights=weights, minlength=cluster_count)
+    means = np.stack([
+        np.bincount(assignment, weights=weights * lab[:, axis], minlength=cluster_count) for axis in range(3)
+    ], axis=1)
+    return means / np.maximum(totals, 1e-12)[:, np.newaxis]
+
+
+def _quantized_palette(palette, lab, weights, assignment, cluster_count):
+    n = len(palette)
+    ids = np.arange(n)
+
+    # The member closest to the weighted mean represents its cluster
+    means = _weighted_means(lab, weights, assignment, cluster_count)
+    distances = ((lab - means[assignment]) ** 2).sum(axis=1)
+    by_cluster = np.lexsort((distances, assignment))
+    starts = np.flatnonzero(np.r_[True, assignment[by_cluster][1:] != assignment[by_cluster][:-1]])
+    representative = np.full(cluster_count, -1)
+    representative[assignment[by_cluster][starts]] = by_cluster[starts]
+
+    # Source ids are in order of first appearance, so a cluster first appears where its lowest id does
+    first_member = np.full(cluster_count, n)
+    np.minimum.at(first_member, assignment, ids)
+    used = np.flatnonzero(first_member < n)
+    used = used[np.argsort(first_member[used])]
+    cluster_ids = np.full(cluster_count, -1, dtype=np.int32)
+    cluster_ids[used] = np.arange(len(used), dtype=np.int32)
+
+    color_map = cluster_ids[assignment]
+    # The extra last entry keeps transparent pixels (label -1) at -1
+    frames = np.append(color_map, -1).astype(np.int32)[palette.frames]
+    colors = [palette.colors[representative[cluster]] for cluster in used]
+    return Palette(colors, frames[0], frames), color_map
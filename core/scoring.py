@@ -0,0 +1,156 @@
+import numpy as np
+from pyciede2000 import ciede2000
+
+from .similarity import color_to_lab, hsv_diffs, ciede2000_similarity_matrix
+
+
+def evaluate_ramp_quality(colors, min_length=3):
+    """Score a ramp given as a list of RGBA colors; higher is smoother."""
+    if len(colors) < 2:
+        return 0.0, {"message": "Ramp too short"}
+
+    # Calculate CIEDE2000 differences between consecutive colors
+    steps = []
+    for i in range(len(colors) - 1):
+        delta_e = ciede2000(color_to_lab(colors[i]), color_to_lab(colors[i + 1]))['delta_E_00']
+        steps.append(delta_e)
+
+    # 1. Step size penalties
+    step_penalties = []
+    for step in steps:
+        if step < 10:
+            penalty = ((10 - step) / 10.0) ** 2
+
+        elif step > 50:
+            penalty = (step / 50.0) ** 2
+
+        else:
+            penalty = 0
+        step_penalties.append(penalty)
+
+    step_size_penalty = (np.sqrt(np.mean(np.array(step_penalties)))) if step_penalties else 0.0
+
+    # 2. Step consistency penalties
+    consistency_penalties = []
+    for i in range(len(steps) - 1):
+        diff = abs(steps[i] - steps[i + 1])
+        penalty = (diff / 10) ** 2
+        consistency_penalties.append(penalty)
+
+    step_consistency_penalty = (np.sqrt(np.mean(np.array(consistency_penalties)))) if consistency_penalties else 0.0
+
+    # 3. Monotony bonus using HSV
+    diffs = hsv_diffs(colors)
+
+    # Get individual scores for each component
+    hue_score = get_monotony_score(diffs[:, 0])
+    sat_score = get_monotony_score(diffs[:, 1])
+    val_score = get_monotony_score(diffs[:, 2])
+
+    monotony_score = (hue_score + sat_score + val_score)
+
+    # 4. Length bonus compared to min length in the group
+    length_bonus = (len(colors) - min_length)
+
+    step_size_penalty = step_size_penalty * 1
+    step_consistency_penalty = step_consistency_penalty * 1
+    monotony_score = monotony_score * 1
+    length_bonus = length_bonus * 0.05
+
+    final_score = monotony_score + length_bonus - step_size_penalty - step_consistency_penalty
+
+    return {
+        'step_size_penalty': step_size_penalty,
+        'step_consistency_penalty': step_consistency_penalty,
+        'monotony_score': monotony_score,
+        'length_bonus': length_bonus,
+        'final_score': final_score
+    }
+
+
+def count_direction_changes(diffs):
+    if len(diffs) < 2:
+        return 0
+
+    # Ignore very small changes to prevent noise
+    significant_diffs = diffs[np.abs(diffs) > 0.05]
+
+    if len(significant_diffs) < 2:
+        return 0
+
+    # Get signs of differences (+1 for positive, -1 for negative)
+    signs = np.sign(significant_diffs)
+
+    # Count how many times the sign changes
+    direction_changes = np.sum(np.abs(np.diff(signs)) == 2)  # diff of +1 to -1 or vice versa is 2
+
+    return direction_changes
+
+
+def get_monotony_score(diffs):
+    changes = count_direction_changes(diffs)
+    if changes > 2:
+        return 0
+    return 1.0 / (changes + 1)
+
+
+def build_similarity_lookup(ramps, colors, similarity_threshold=10):
+    """ΔE similarity of every color used by `ramps`, and the matrix index of each color id."""
+    # Compare every color used by the ramps once, instead of once per DP cell
+    color_ids = sorted({color_id for ramp in ramps for color_id in ramp})
+    similar = ciede2000_similarity_matrix([colors[color_id] for color_id in color_ids], similarity_threshold)
+    return similar, {color_id: i for i, color_id in enumerate(color_ids)}
+
+
+def ramp_edit_distance(r1, r2, colors=None, similarity_threshold=10, swap_cost=0.5, insertion_cost=1.0,
+                       substitution_cost=1.0, permutation_cost=0.0, similarity=None, max_distance=None):
+    """
+    Damerau-Levenshtein distance between two ramps, where colors closer than
+    `similarity_threshold` (ΔE) substitute for free.
+
+    `similarity` is a lookup from `build_similarity_lookup`; pass it when comparing
+    many ramps from the same palette, otherwise `colors` is needed to build one. With
+    `max_distance`, the computation stops as soon as the distance is known to exceed
+    it and a lower bound above `max_distance` is returned instead of the exact value.
+    """
+    # Quick check: same colors, just reordered
+    if set(r1) == set(r2):
+        return permutation_cost
+
+    if similarity is None:
+        similarity = build_similarity_lookup([r1, r2], colors, similarity_threshold)
+    similar, index = similarity
+    similar_rows = similar[np.ix_([index[c] for c in r1], [index[c] for c in r2])].tolist()
+
+    len_r1, len_r2 = len(r1), len(r2)
+    before_previous = None
+    previous = [j * insertion_cost for j in range(len_r2 + 1)]
+
+    for i in range(1, len_r1 + 1):
+        current = [i * insertion_cost] + [0.0] * len_r2
+        similar_row = similar_rows[i - 1]
+
+        for j in range(1, len_r2 + 1):
+            subst_cost = 0 if similar_row[j - 1] else substitution_cost
+
+            best = min(
+                previous[j] + insertion_cost,
+                current[j - 1] + insertion_cost,
+                previous[j - 1] + subst_cost
+            )
+
+            # Handle adjacent swaps (Damerau-Levenshtein)
+            if i > 1 and j > 1 and r1[i - 1] == r2[j - 2] and r1[i - 2] == r2[j - 1]:
+                best = min(best, before_previous[j - 2] + swap_cost)
+
+            current[j] = best
+
+        # Every path to the last cell crosses one of the last two rows
+        if max_distance is not None:
+            lower_bound = min(min(current), min(previous))
+            if lower_bound > max_distance:
+                return lower_bound
+
+        before_previous, previous = previous, current
+
+    return previous[len_r2]
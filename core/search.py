@@ -0,0 +1,361 @@
+import math
+from collections import Counter
+from time import monotonic
+
+import numpy as np
+from pyciede2000 import ciede2000
+
+from .similarity import color_to_hsv, color_to_lab, hsv_diffs
+
+
+class SearchBudget:
+    """Time and result limits for the ramp search, and how much of the search space it covered."""
+
+    def __init__(self, time_limit=None, max_candidates=None):
+        self.deadline = monotonic() + time_limit if time_limit else None
+        self.max_candidates = max_candidates or None
+        self.found = 0
+        self.covered = 0.0
+        self.stop_reason = None
+
+    def expired(self):
+        if self.max_candidates is not None and self.found >= self.max_candidates:
+            self.stop_reason = "candidate limit"
+        elif self.deadline is not None and monotonic() >= self.deadline:
+            self.stop_reason = "time limit"
+        return self.stop_reason is not None
+
+
+class StreamingRampFilter:
+    """
+    Online version of the subsequence and reverse filters, used to show ramps while the
+    search is still running. Of a ramp and its reverse, the first one found is kept
+    rather than the better scoring one; the exact filters run once the search completes.
+    """
+
+    def __init__(self, skip_subsequences=True, skip_reverse=True):
+        self.skip_subsequences = skip_subsequences
+        self.skip_reverse = skip_reverse
+        self.ramps = {}
+        self._covered = Counter()
+
+    def add(self, ramp):
+        """Returns whether the ramp is kept and the keys of kept ramps it supersedes."""
+        key = tuple(ramp)
+        if key in self.ramps:
+            return False, []
+        if self.skip_reverse and key[::-1] in self.ramps:
+            return False, []
+        if self.skip_subsequences and self._covered[key] > 0:
+            return False, []
+
+        superseded = []
+        if self.skip_subsequences:
+            pieces = self._pieces(key)
+            for piece in pieces:
+                if piece in self.ramps:
+                    superseded.append(piece)
+                    del self.ramps[piece]
+                    self._covered.subtract(self._pieces(piece))
+            self._covered.update(pieces)
+
+        self.ramps[key] = ramp
+        return True, superseded
+
+    @staticmethod
+    def _pieces(key):
+        # Shorter contiguous runs of at least 3 colors, in both directions
+        pieces = set()
+        for length in range(3, len(key)):
+            for i in range(len(key) - length + 1):
+                piece = key[i:i + length]
+                pieces.add(piece)
+                pieces.add(piece[::-1])
+        return pieces
+
+
+def find_color_ramps(graph, colors, method="Basic HSV", params=None, max_length=20, progress=None):
+    return list(iter_color_ramps(graph, colors, method, params, max_length, progress))
+
+
+def iter_color_ramps(graph, colors, method="Basic HSV", params=None, max_length=20, progress=None, budget=None,
+                     stats=None):
+    """
+    Depth-first search over the graph, yielding each ramp that cannot be extended further.
+
+    `colors` maps each node's color id to its RGBA color. Extensions are explored
+    smoothest first (see extension_penalty), so when `budget` runs out the ramps found
+    so far come from the most promising branches. Each path carries its share of the
+    search space, split evenly among its extensions, and the shares of finished paths
+    add up to `budget.covered`. Counts of the work done are added to `stats`.
+    """
+    if params is None:
+        params = {}
+    if budget is None:
+        budget = SearchBudget()
+
+    sorted_nodes = sorted(graph.nodes, key=lambda color_id: color_to_hsv(colors[color_id])[2])
+    if not sorted_nodes:
+        budget.covered = 1.0
+        return
+
+    # Counted locally and added to stats once, also when the caller stops early
+    expanded = checks = valid = dead_ends = 0
+    try:
+        start_share = 1.0 / len(sorted_nodes)
+        for start in sorted_nodes:
+            stack = [(start, [start], start_share)]
+            while stack:
+                if budget.expired():
+                    return
+
+                # Reported per expansion so cancelling stays responsive on long searches from one start
+                if progress:
+                    progress("Extracting Ramps...", int(budget.covered * 1000), 1000)
+
+                current, path, share = stack.pop()
+                expanded += 1
+
+                extensions = []
+                if len(path) < max_length:
+                    for neighbor in graph.neighbors(current):
+                        if neighbor in path:
+                            continue
+                        new_path = path + [neighbor]
+                        checks += 1
+                        if is_valid_ramp([colors[color_id] for color_id in new_path], method, params):
+                            extensions.append(new_path)
+                valid += len(extensions)
+
+                if extensions:
+                    # Pushed worst first, so the smoothest extension is popped next
+                    extensions.sort(key=lambda p: extension_penalty([colors[color_id] for color_id in p[-3:]]),
+                                    reverse=True)
+                    for new_path in extensions:
+                        stack.append((new_path[-1], new_path, share / len(extensions)))
+                else:
+                    budget.covered += share
+                    if len(path) >= 3:
+                        budget.found += 1
+                        yield path
+                    else:
+                        dead_ends += 1
+
+        budget.covered = 1.0
+    finally:
+        if stats is not None:
+            stats.count("search: nodes expanded", expanded)
+            stats.count("search: validity checks", checks)
+            stats.count("search: valid extensions", valid)
+            stats.count("search: too short to keep", dead_ends)
+            stats.count("search: candidates found", budget.found)
+
+
+def extension_penalty(ramp_colors):
+    """
+    Cheap estimate of how much the last step hurts the ramp: the step size and step
+    consistency penalties of evaluate_ramp_quality, on Euclidean Lab distances (ΔE76)
+    of the last two steps instead of CIEDE2000 over the whole ramp.
+    """
+    labs = [color_to_lab(color) for color in ramp_colors[-3:]]
+    steps = [math.dist(a, b) for a, b in zip(labs, labs[1:])]
+
+    step = steps[-1]
+    if step < 10:
+        penalty = ((10 - step) / 10.0) ** 2
+    elif step > 50:
+        penalty = (step / 50.0) ** 2
+    else:
+        penalty = 0.0
+
+    if len(steps) > 1:
+        penalty += (abs(steps[-1] - steps[-2]) / 10) ** 2
+    return penalty
+
+
+def is_valid_ramp(ramp_colors, method, params):
+    if method == "Basic HSV":
+        return is_valid_ramp_hsv(ramp_colors, params)
+    elif method == "CIEDE2000":
+        return is_valid_ramp_ciede2000(ramp_colors, params)
+
+    return False
+
+
+def is_valid_ramp_hsv(colors, params):
+
+    # Get differences using existing function
+    diffs = hsv_diffs(colors)
+
+    # For each component (H, S, V)
+    for idx in range(3):
+        component_diffs = diffs[:, idx]
+
+        # Check step sizes
+        steps = np.abs(component_diffs)
+        if np.any(steps < params['min_step'][idx]):
+            return False
+        if np.any(steps > params['max_step'][idx]):
+            return False
+
+        # Check step size consistency
+        if len(steps) > 1:
+            step_differences = np.abs(steps[1:] - steps[:-1])
+            if np.any(step_differences > params['step_tolerance'][idx]):
+                return False
+
+        # Check monotonicity if required
+        if params['strict_monotony'][idx]:
+            signs = np.sign(component_diffs)
+            if not (np.all(signs >= 0) or np.all(signs <= 0)):
+                return False
+
+    return True
+
+
+def is_valid_ramp_ciede2000(colors, params):
+    # Lab values are cached, the search revisits the same colors
+    lab_colors = [color_to_lab(color) for color in colors]
+    lab_array = np.array(lab_colors)
+
+    # Calculate vectors between consecutive colors
+    vectors = np.diff(lab_array, axis=0)  # Shape: (n-1, 3)
+
+    # Calculate CIEDE2000 differences between consecutive colors
+    delta_e_steps = []
+    for i in range(len(lab_colors) - 1):
+        delta_e = ciede2000(lab_colors[i], lab_colors[i + 1])['delta_E_00']
+        delta_e_steps.append(delta_e)
+
+    delta_e_steps = np.array(delta_e_steps)
+
+    # Check min/max step sizes
+    if np.any(delta_e_steps < params['min_step']) or np.any(delta_e_steps > params['max_step']):
+        return False
+
+    # Check step consistency
+    if len(delta_e_steps) > 1:
+        step_differences = np.abs(delta_e_steps[1:] - delta_e_steps[:-1])
+        if np.any(step_differences > params['step_tolerance']):
+            return False
+
+    # Check direction consistency in LCH space
+    for i in range(len(vectors) - 1):
+        v1 = vectors[i]
+        v2 = vectors[i + 1]
+
+        norm_v1: float = float(np.linalg.norm(v1))
+        norm_v2: float = float(np.linalg.norm(v2))
+
+        if norm_v1 == 0.0 or norm_v2 == 0.0:
+            continue
+
+        cos_angle = np.dot(v1, v2) / (norm_v1 * norm_v2)
+        angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
+        angle_deg = np.degrees(angle)
+
+        if angle_deg > params['angle_tolerance']:
+            return False
+
+    return True
+
+
+def is_monotonic_direction(deltas):
+    # Ignore near-zero steps to prevent noise triggering false negatives
+    non_zero = deltas[np.abs(deltas) > 0.05]
+    if len(non_zero) == 0:
+        return True
+    return np.all(non_zero >= 0) or np.all(non_zero <= 0)
+
+
+def is_monotonic_delta_e(delta_e_steps, tolerance=1):
+    diffs = np.diff(delta_e_steps)
+    non_zero_diffs = diffs[np.abs(diffs) > tolerance]
+    if len(non_zero_diffs) == 0:
+        return True  # Flat ΔE changes, accept as monotonic
+    return np.all(non_zero_diffs >= 0) or np.all(non_zero_diffs <= 0)
+
+
+def is_consistent_step_size(deltas, tolerance):
+    non_zero = deltas[np.abs(deltas) > 0.001]
+    if len(non_zero) < 2:
+        return True
+    step_diffs = np.diff(non_zero)
+    return np.all(np.abs(step_diffs) <= tolerance)
+
+
+def is_subsequence_of_any(candidate, ramps):
+    candidate_length = len(candidate)
+    reversed_candidate = list(reversed(candidate))
+
+    for ramp in ramps:
+        ramp_length = len(ramp)
+        if ramp_length <= candidate_length:
+            continue
+        for i in range(ramp_length - candidate_length + 1):
+            if ramp[i:i + candidate_length] == candidate or ramp[i:i + candidate_length] == reversed_candidate:
+            ## if ramp[i:i + candidate_length] == candidate:
+                return True
+    return False
+
+
+def remove_subsequences(ramp_scores, progress=None):
+    # Sort by score (descending) and length (descending) for stable results
+    ramp_scores.sort(key=lambda x: (-x[1], -len(x[0])))
+    filtered_scores = []
+    all_ramps = [r for r, _ in ramp_scores]  # Keep all ramps for checking
+
+    for i, (ramp, score) in enumerate(ramp_scores):
+        if progress:
+            progress("Removing Subsequences...", i, len(ramp_scores))
+        # Create list of all other ramps (excluding current one)
+        other_ramps = all_ramps[:i] + all_ramps[i + 1:]
+        # Only keep ramp if it's not a subsequence of any other ramp
+        if not is_subsequence_of_any(ramp, other_ramps):
+            filtered_scores.append((ramp, score))
+
+    return filtered_scores
+
+
+def remove_reverses(ramp_scores, progress=None):
+    # Group ramps with their reverses
+    processed = set()
+    filtered_scores = []
+    for i, (ramp, score) in enumerate(ramp_scores):
+        if progress:
+            progress("Removing Reverses...", i, len(ramp_scores))
+        if tuple(ramp) in processed:
+            continue
+
+        reverse = tuple(reversed(ramp))
+        processed.add(tuple(ramp))
+        processed.add(reverse)
+
+        # Find scores for both original and reverse
+        reverse_score = next((s for r, s in ramp_scores if tuple(r) == reverse), None)
+        if reverse_score is not None:
+            # Keep the better scoring version
+            if score >= reverse_score:
+                filtered_scores.append((ramp, score))
+            else:
+                filtered_scores.append((list(reverse), reverse_score))
+        else:
+            filtered_scores.append((ramp, score))
+    ramp_scores = filtered_scores
+    return ramp_scores
+
+
+def remove_permutations(ramp_scores, progress=None):
+    if progress:
+        progress("Removing Permutations...", 0, 0)
+    # Group ramps by their set of colors
+    perm_groups = {}
+    for ramp, score in ramp_scores:
+        color_set = frozenset(ramp)
+        if color_set not in perm_groups:
+            perm_groups[color_set] = []
+        perm_groups[color_set].append((ramp, score))
+    # Keep only the best scoring ramp from each permutation group
+    ramp_scores = [max(group, key=lambda x: x[1])
+                   for group in perm_groups.values()]
+    return ramp_scores
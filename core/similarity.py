@@ -0,0 +1,97 @@
+import colorsys
+from functools import lru_cache
+
+import numpy as np
+from pyciede2000 import ciede2000
+
+
+def color_to_hsv(c):
+    r, g, b = [x / 255.0 for x in c[:3]]
+    return colorsys.rgb_to_hsv(r, g, b)
+
+
+def color_to_lab(c):
+    return _rgb_to_lab(*(int(x) for x in c[:3]))
+
+
+@lru_cache(maxsize=4096)
+def _rgb_to_lab(r, g, b):
+    # colormath pulls in networkx and takes about 0.1 s to import, so only on first use
+    from colormath.color_conversions import convert_color
+    from colormath.color_objects import sRGBColor, LabColor
+
+    lab = convert_color(sRGBColor(r / 255.0, g / 255.0, b / 255.0), LabColor)
+    return lab.lab_l, lab.lab_a, lab.lab_b
+
+
+# sRGB to XYZ and the D65 white point, as colormath uses them for color_to_lab
+_SRGB_TO_XYZ = np.array([
+    [0.412424, 0.357579, 0.180464],
+    [0.212656, 0.715158, 0.0721856],
+    [0.0193324, 0.119193, 0.950444],
+])
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def colors_to_lab(colors):
+    """color_to_lab of many colors at once, as an (n, 3) array."""
+    rgb = np.atleast_2d(np.asarray(colors, dtype=np.float64))[:, :3] / 255.0
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _SRGB_TO_XYZ.T / _D65_WHITE
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def hsv_diffs(colors):
+    hsv_values = np.array([color_to_hsv(c) for c in colors])
+    diffs = np.diff(hsv_values, axis=0)
+
+    # Hue circular correction
+    hue_diffs = diffs[:, 0]
+    hue_diffs = (hue_diffs + 0.5) % 1.0 - 0.5
+    diffs[:, 0] = hue_diffs
+
+    # Convert hue to degrees for more intuitive parameters
+    diffs[:, 0] *= 360
+
+    return diffs
+
+
+def is_similar_hsv(c1, c2, hue_threshold=180, sat_threshold=1.0, val_threshold=1.0):
+    hsv1 = np.array(color_to_hsv(c1))
+    hsv2 = np.array(color_to_hsv(c2))
+
+    diffs = hsv1 - hsv2
+    diffs[0] = (diffs[0] + 0.5) % 1.0 - 0.5  # Correct hue circular difference
+
+    hue_diff = abs(diffs[0]) * 359  # Convert to degrees
+    sat_diff = abs(diffs[1])
+    val_diff = abs(diffs[2])
+
+    return (hue_diff <= hue_threshold and
+            sat_diff <= sat_threshold and
+            val_diff <= val_threshold)
+
+
+def is_similar_ciede2000(c1, c2, threshold=100):
+    delta_e = ciede2000(color_to_lab(c1), color_to_lab(c2))['delta_E_00']
+    return delta_e < threshold
+
+
+def ciede2000_similarity_matrix(colors, threshold=100):
+    """Boolean matrix of `is_similar_ciede2000` for every pair of colors.
+
+    Each color is converted to Lab once, so the cost is one ΔE per pair
+    instead of two conversions and a ΔE per lookup.
+    """
+    lab_colors = [color_to_lab(c) for c in colors]
+    n = len(lab_colors)
+
+    similar = np.zeros((n, n), dtype=bool)
+    np.fill_diagonal(similar, 0 < threshold)
+    for i in range(n):
+        for j in range(i + 1, n):
+            delta_e = ciede2000(lab_colors[i], lab_colors[j])['delta_E_00']
+            similar[i, j] = similar[j, i] = delta_e < threshold
+
+    return similar
@@ -0,0 +1,51 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from time import monotonic
+
+
+class Stats:
+    """
+    Spans (total seconds per named stage) and counters collected during one run.
+
+    Pass an instance to the functions that accept `stats`; they add to it as they go.
+    Spans with the same name add up, so a stage entered several times reports its total.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.spans = {}
+        self.counters = Counter()
+
+    @contextmanager
+    def span(self, name):
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + monotonic() - start
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "spans": dict(self.spans),
+            "counters": dict(self.counters),
+        }
+
+    def append_json(self, path, **extra):
+        """Append this run as one JSON line, with a timestamp and any `extra` fields."""
+        record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), **extra, **self.as_dict()}
+        with open(path, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def format(self):
+        lines = []
+        for name, seconds in self.spans.items():
+            lines.append(f"{name:<32}{seconds * 1000:>10.1f} ms")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<32}{value:>10}")
+        return "\n".join(lines)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "automating_color_ramps", "extractions"
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Part of every key: bump it whenever the search, filters or clustering give different
+# results, so entries of the old code are never served (2: deterministic cluster ties)
+CACHE_VERSION = 2
+
+
+class ExtractionCache:
+    """
+    On-disk cache of ramp extraction results, one JSON file per request.
+
+    Entries are addressed by a hash of everything the result depends on (see make_key).
+    Reading an entry refreshes its modification time, and the least recently used entries
+    are evicted once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(colors, edges, method, params, options):
+        """
+        `colors` maps color id to RGBA, `edges` are the graph's (u, v) pairs and `options`
+        the run_extraction keyword arguments that change the result.
+        """
+        request = {
+            "version": CACHE_VERSION,
+            "colors": sorted((int(color_id), [int(c) for c in color]) for color_id, color in colors.items()),
+            "edges": sorted(sorted((int(u), int(v))) for u, v in edges),
+            "method": method,
+            "params": params,
+            "options": options,
+        }
+        encoded = json.dumps(request, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Returns (final_ramps, clusters) as stored by put, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        clusters = entry.get("clusters")
+        if clusters is not None:
+            clusters = (clusters["ramps"], np.array(clusters["labels"], dtype=int))
+        return entry["ramps"], clusters
+
+    def put(self, key, final_ramps, clusters=None):
+        entry = {"ramps": [[int(c) for c in ramp] for ramp in final_ramps]}
+        if clusters is not None:
+            clustered_ramps, labels = clusters
+            entry["clusters"] = {
+                "ramps": [[int(c) for c in ramp] for ramp in clustered_ramps],
+                "labels": [int(label) for label in labels],
+            }
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written next to the target and renamed, so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # A missing cache entry only costs a recomputation next time
+            return
+
+        self.evict()
+
+    def evict(self):
+        try:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
@@ -1,7 +1,10 @@
 from dataclasses import dataclass
 from typing import List, Set, Tuple, Dict
 
+from PyQt6.QtCore import QCoreApplication, QTimer
+
 import color_utils
+import core
 
 
 @dataclass
@@ -13,35 +16,37 @@ class ColorGroup:
 class ColorManager:
     def __init__(self):
         self.color_groups: Dict[int, ColorGroup] = {}
+        self.label_map = None
+        self.frames = None
 
     def load_image(self, image_array):
         """Initialize color groups from a new image."""
+        self.load_palette(core.Palette.from_image(image_array))
+
+    def load_palette(self, palette):
+        """Initialize color groups from an already grouped image."""
+        self.label_map = palette.labels
+        self.frames = palette.frames
+
         self.color_groups.clear()
-        height, width = image_array.shape[:2]
-
-        color_positions: Dict[Tuple[int, int, int, int], Set[Tuple[int, int]]] = {}
-
-        for y in range(height):
-            for x in range(width):
-                color = tuple(image_array[y, x])
-                if color[3] > 0:  # Only process non-transparent pixels
-                    if color not in color_positions:
-                        color_positions[color] = set()
-                    color_positions[color].add((x, y))
-
-        next_color_id = 0
-        for color, positions in color_positions.items():
-            color_group = ColorGroup(
-                color_id=next_color_id,
+        for color_id, (color, positions) in enumerate(zip(palette.colors, palette.pixel_positions())):
+            self.color_groups[color_id] = ColorGroup(
+                color_id=color_id,
                 pixel_positions=positions,
                 current_color=color
             )
-            self.color_groups[next_color_id] = color_group
-            next_color_id += 1
+
+    def set_frame(self, index):
+        """Look up colors by position in frame `index` of an animation."""
+        self.label_map = self.frames[index]
 
     def get_color_groups(self) -> List[ColorGroup]:
         return list(self.color_groups.values())
 
+    def get_colors(self) -> Dict[int, Tuple[int, int, int, int]]:
+        """Current color of every color id, for the core algorithms."""
+        return {color_id: group.current_color for color_id, group in self.color_groups.items()}
+
     def set_color(self, color_id, new_color):
         if color_id in self.color_groups:
             self.color_groups[color_id].current_color = new_color
@@ -49,10 +54,12 @@ class ColorManager:
         return False
 
     def get_color_id_at_position(self, x, y):
-        for color_id, group in self.color_groups.items():
-            if (x, y) in group.pixel_positions:
-                return color_id
-        return -1
+        if self.label_map is None:
+            return -1
+        height, width = self.label_map.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return -1
+        return int(self.label_map[y, x])
 
     def get_color_id_by_color(self, color):
         return [
@@ -69,11 +76,25 @@ class ColorManager:
 
 
 class ColorSelectionManager:
-    def __init__(self):
+    """
+    Selected and hovered color id. Listeners registered with register_listener hear
+    about every change; callbacks subscribed to a color id only when that color
+    becomes or stops being selected or hovered.
+
+    Hover changes are delivered at most once per `hover_interval` milliseconds, with
+    only the latest state, and not at all if the hover ended where it started.
+    Selection changes are delivered right away.
+    """
+
+    def __init__(self, hover_interval=16):
         self.selected_color_id = None
         self.hovered_color_id = None
         self.highlight_color = "red"
+        self.hover_interval = hover_interval
         self._listeners = []
+        self._subscribers = {}
+        self._notified = (None, None)
+        self._hover_timer = None
 
     def select_color_id(self, color_id):
         if color_id is not None and color_id in global_color_manager.color_groups:
@@ -86,7 +107,7 @@ class ColorSelectionManager:
         if color_id is not None and color_id in global_color_manager.color_groups:
             self.hovered_color_id = color_id
             self.update_highlight_color(color_id)
-            self.notify_listeners()
+            self._schedule_hover_notification()
 
     def clear_selection(self):
         self.selected_color_id = None
@@ -98,7 +119,7 @@ class ColorSelectionManager:
         self.hovered_color_id = None
         if self.selected_color_id is not None and self.selected_color_id in global_color_manager.color_groups:
             self.update_highlight_color(self.selected_color_id)
-        self.notify_listeners()
+        self._schedule_hover_notification()
 
     def update_highlight_color(self, color_id):
         if color_id is not None:
@@ -115,9 +136,55 @@ class ColorSelectionManager:
         if callback in self._listeners:
             self._listeners.remove(callback)
 
+    def subscribe(self, color_id, callback):
+        callbacks = self._subscribers.setdefault(color_id, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    def unsubscribe(self, color_id, callback):
+        callbacks = self._subscribers.get(color_id)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self._subscribers[color_id]
+
+    def _schedule_hover_notification(self):
+        # Without an event loop there is nothing to coalesce with
+        if QCoreApplication.instance() is None:
+            self.notify_listeners()
+            return
+        if self._hover_timer is None:
+            self._hover_timer = QTimer()
+            self._hover_timer.setSingleShot(True)
+            self._hover_timer.timeout.connect(self._deliver_hover)
+        if not self._hover_timer.isActive():
+            self._hover_timer.start(self.hover_interval)
+
+    def _deliver_hover(self):
+        if (self.selected_color_id, self.hovered_color_id) != self._notified:
+            self.notify_listeners()
+
     def notify_listeners(self):
-        for callback in self._listeners:
-            callback(self.selected_color_id, self.hovered_color_id)
+        # Anything pending is covered by this notification
+        if self._hover_timer is not None:
+            self._hover_timer.stop()
+
+        selected_id, hovered_id = self.selected_color_id, self.hovered_color_id
+        previous_selected, previous_hovered = self._notified
+        self._notified = (selected_id, hovered_id)
+
+        for callback in list(self._listeners):
+            callback(selected_id, hovered_id)
+
+        # Only colors whose selected or hovered state changed
+        for color_id in {previous_selected, previous_hovered, selected_id, hovered_id}:
+            if color_id is None:
+                continue
+            was = (color_id == previous_selected, color_id == previous_hovered)
+            now = (color_id == selected_id, color_id == hovered_id)
+            if was != now:
+                for callback in list(self._subscribers.get(color_id, ())):
+                    callback(selected_id, hovered_id)
 
 
 class ColorRampManager:
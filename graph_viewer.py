@@ -1,5 +1,4 @@
 import networkx as nx
-import numpy as np
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QSlider, QPushButton,
     QLabel, QSizePolicy, QCheckBox, QGridLayout, QGroupBox
@@ -8,7 +7,8 @@ from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib import pyplot as plt
 
-from color_utils import extract_adjacent_color_pairs, is_similar_hsv, is_similar_ciede2000
+import core
+from color_utils import extract_adjacent_color_pairs
 from global_managers import global_color_manager, global_ramp_manager
 
 
@@ -22,6 +22,7 @@ class GraphViewer(QWidget):
         }
 
         self.color_graph = None
+        self.graph_stats = core.Stats("graph")
         self.use_8_neighbors = False
         self.graph_window = None  # Add this line to store the window reference
 
@@ -286,6 +287,7 @@ class GraphViewer(QWidget):
             return
 
         graph_type = self.graph_type_selector.currentText()
+        self.graph_stats = core.Stats("graph")
 
         if graph_type == "Spatial Adjacency Graph":
             graph = self.generate_spatial_graph()
@@ -294,14 +296,14 @@ class GraphViewer(QWidget):
         elif graph_type == "Hybrid Graph (Spatial + Color)":
             spatial_graph = self.generate_spatial_graph()
             color_graph = self.generate_color_graph()
-            graph = self.combine_graphs(spatial_graph, color_graph)
+            with self.graph_stats.span("combine graphs"):
+                graph = self.combine_graphs(spatial_graph, color_graph)
         else:
             raise ValueError(f"Unknown graph type: {graph_type}")
 
         self.color_graph = graph
-        
-        # Count total edges and mark relevant ones
-        total_edges = len(graph.edges)
+        self.graph_stats.count("nodes", graph.number_of_nodes())
+        self.graph_stats.count("edges", graph.number_of_edges())
         
         # Add relevance attribute to edges
         ramps = global_ramp_manager.get_ramps()
@@ -324,103 +326,45 @@ class GraphViewer(QWidget):
                 graph.edges[edge]['relevant'] = is_relevant
                 if is_relevant:
                     relevant_edges += 1
-        
-            print(f"Total edges: {total_edges}")
-            print(f"Relevant edges: {relevant_edges}")
-            print(f"Irrelevant edges: {total_edges - relevant_edges}")
+            self.graph_stats.count("relevant edges", relevant_edges)
         else:
             # If no ramps, mark all edges as relevant
             for edge in graph.edges:
                 graph.edges[edge]['relevant'] = True
-            print(f"Total edges: {total_edges}")
 
-        self.display_graph(graph)
+        with self.graph_stats.span("layout and drawing"):
+            self.display_graph(graph)
         self.graph_updated.emit()
 
     def generate_spatial_graph(self):
-        self.calculate_adjacency_pairs()
+        with self.graph_stats.span("adjacency pairs"):
+            self.calculate_adjacency_pairs()
 
         method = self.spatial_method_selector.currentText()
         threshold = self.spatial_threshold_slider.value()
 
-        if method == "Percentile-based":
-            print(f"Percentile: {threshold}%")
-        elif method == "Relative to color frequency":
-            print(f"Relative Adjacency: ≥ {threshold / 100:.2f}")
-        elif method == "Absolute":
-            print(f"Occurrences: ≥ {threshold}")
-
-        filtered_pairs = self.filter_adjacency_pairs(
-            self._cached_adjacency_pairs,
-            self._cached_color_counts,
-            method,
-            threshold
-        )
-
-        graph = nx.Graph()
-        for (id1, id2), count in filtered_pairs.items():
-            graph.add_edge(id1, id2)
-
+        with self.graph_stats.span("spatial graph"):
+            graph = core.build_spatial_graph(self._cached_adjacency_pairs, self._cached_color_counts, method, threshold)
+        self.graph_stats.count("spatial edges", graph.number_of_edges())
         return graph
 
     def generate_color_graph(self):
-        self.calculate_similarity_pairs()
+        with self.graph_stats.span("similarity pairs"):
+            self.calculate_similarity_pairs()
 
         method = self.color_method_selector.currentText()
         threshold = self.color_threshold_slider.value()
+        hsv_thresholds = (self.hue_slider.value(), self.sat_slider.value() / 100.0, self.val_slider.value() / 100.0)
 
-        if method == "HSV":
-            hue_thresh = self.hue_slider.value()
-            sat_thresh = self.sat_slider.value() / 100.0
-            val_thresh = self.val_slider.value() / 100.0
-            print(f"Hue diff: ≤ {hue_thresh}°")
-            print(f"Sat diff: ≤ {sat_thresh:.2f}")
-            print(f"Val diff: ≤ {val_thresh:.2f}")
-
-            valid_pairs = [
-                (c1_id, c2_id) for c1_id, c2_id in self._cached_similarity_pairs
-                if is_similar_hsv(
-                    self.color_groups[c1_id].current_color,
-                    self.color_groups[c2_id].current_color,
-                    hue_thresh, sat_thresh, val_thresh
-                )
-            ]
-        elif method == "CIEDE2000":
-            print(f"ΔE Similarity: ≤ {threshold}")
-            valid_pairs = [
-                (c1_id, c2_id) for c1_id, c2_id in self._cached_similarity_pairs
-                if is_similar_ciede2000(
-                    self.color_groups[c1_id].current_color,
-                    self.color_groups[c2_id].current_color,
-                    threshold
-                )
-            ]
-        else:
-            raise ValueError(f"Unknown color similarity method: {method}")
-
-        graph = nx.Graph()
-        for c1_id, c2_id in valid_pairs:
-            graph.add_edge(c1_id, c2_id)
-
+        colors = {color_id: group.current_color for color_id, group in self.color_groups.items()}
+        with self.graph_stats.span("color graph"):
+            graph = core.build_color_graph(colors, self._cached_similarity_pairs, method, threshold, hsv_thresholds)
+        self.graph_stats.count("color pairs compared", len(self._cached_similarity_pairs))
+        self.graph_stats.count("color edges", graph.number_of_edges())
         return graph
 
     def combine_graphs(self, spatial_graph, color_graph):
-        method = self.combination_method_selector.currentText()
-        combined_graph = nx.Graph()
-
-        if method == "Union":
-            combined_graph.add_edges_from(spatial_graph.edges)
-            combined_graph.add_edges_from(color_graph.edges)
-        elif method == "Intersection":
-            spatial_edges = {frozenset(edge) for edge in spatial_graph.edges}
-            color_edges = {frozenset(edge) for edge in color_graph.edges}
-            common_edges = spatial_edges.intersection(color_edges)
-            for edge in common_edges:
-                combined_graph.add_edge(*tuple(edge))
-        else:
-            raise ValueError(f"Unknown combination method: {method}")
-
-        return combined_graph
+        return core.combine_graphs(spatial_graph, color_graph, self.combination_method_selector.currentText())
 
     def calculate_adjacency_pairs(self):
         if self._cached_adjacency_pairs is None or self._cached_color_counts is None:
@@ -431,48 +375,7 @@ class GraphViewer(QWidget):
 
     def calculate_similarity_pairs(self):
         if self._cached_similarity_pairs is None:
-            color_ids = list(self.color_groups.keys())
-            self._cached_similarity_pairs = [
-                (c1, c2) for i, c1 in enumerate(color_ids)
-                for c2 in color_ids[i + 1:]
-            ]
-
-    @staticmethod
-    def filter_adjacency_pairs(pair_counts, color_counts, method, threshold):
-        if not pair_counts:
-            return {}
-
-        if method == "Absolute":
-            return {pair: count for pair, count in pair_counts.items()
-                    if count >= threshold}
-
-        elif method == "Relative to color frequency":
-            relative_counts = GraphViewer.calculate_relative_adjacency(pair_counts, color_counts)
-            return {
-                pair: count for pair, count in pair_counts.items()
-                if relative_counts[pair] >= threshold / 100.0
-            }
-
-        elif method == "Percentile-based":
-            relative_counts = GraphViewer.calculate_relative_adjacency(pair_counts, color_counts)
-            t_val = np.percentile(list(relative_counts.values()), threshold)
-            return {pair: count for pair, count in pair_counts.items()
-                    if relative_counts[pair] >= t_val}
-
-
-        raise ValueError(f"Unknown spatial filtering method: {method}")
-
-    @staticmethod
-    def calculate_relative_adjacency(pair_counts, color_counts):
-        adjacency = {
-            pair: max(
-                count / max(1, color_counts[pair[0]]),
-                count / max(1, color_counts[pair[1]])
-            )
-            for pair, count in pair_counts.items()
-        }
-        ## print("Adjacency values:", adjacency)
-        return adjacency
+            self._cached_similarity_pairs = core.all_color_pairs(self.color_groups.keys())
 
     def display_graph(self, graph):
         fig, ax = plt.subplots(figsize=(6, 6))
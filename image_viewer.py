@@ -1,17 +1,51 @@
 from PyQt6 import QtCore
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSlider, QSizePolicy, QScrollArea, QFileDialog
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QImage, QColor
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSlider, QSizePolicy, QFileDialog, \
+    QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsItem, QSpinBox, QMessageBox
+from PyQt6.QtCore import Qt, QRectF, QPointF
+from PyQt6.QtGui import QPixmap, QImage, QColor, QPainter, QTransform
 import numpy as np
 import math
+from collections import OrderedDict
 from PIL import Image
 
+import core
 from color_utils import get_text_descriptions
 from global_managers import global_selection_manager, global_color_manager
 from palette import ColorPalette
 
 
+class ImageBufferItem(QGraphicsItem):
+    """
+    Draws a QImage straight from its buffer, so edits to the buffer only need
+    update(rect) to show up, without converting the image to a pixmap first.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.image = None
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+    def set_image(self, image):
+        self.prepareGeometryChange()
+        self.image = image
+        self.update()
+
+    def boundingRect(self):
+        if self.image is None:
+            return QRectF()
+        return QRectF(0, 0, self.image.width(), self.image.height())
+
+    def paint(self, painter, option, widget=None):
+        if self.image is None:
+            return
+        # Only the exposed part of the image, which is all that changed after update(rect)
+        rect = option.exposedRect.toAlignedRect().intersected(self.image.rect())
+        painter.drawImage(rect, self.image, rect)
+
+
 class ImageViewer(QWidget):
+    MASK_CACHE_SIZE = 32
+
     def __init__(self, show_load_button=True, palette_square_size=40, show_color_details=True):
         super().__init__()
         self.original_pixmap = None
@@ -19,7 +53,19 @@ class ImageViewer(QWidget):
         self.palette_square_size = palette_square_size
         self.show_color_details = show_color_details
         self.show_load_button = show_load_button
+        self.max_colors = 0  # 0 loads every color, otherwise larger palettes are quantized down to it
+        self.quantize_method = "K-means"
+        # Displayed color id of every color id of the file, when it was quantized on load
+        self.color_map = None
         self.image_array = None
+        self.image = None
+        self.label_map = None
+        self.frames = None
+        self.frame_durations = [0]
+        self.frame_index = 0
+        self.lut = None
+        self.color_bounds = None
+        self._mask_cache = OrderedDict()
         self._setup_ui(show_load_button)
         global_selection_manager.register_listener(self.on_selection_change)
 
@@ -36,27 +82,40 @@ class ImageViewer(QWidget):
             self.saveAsButton.clicked.connect(self.save_image_as)
             self.saveAsButton.setEnabled(False)  # Initially disabled
             button_layout.addWidget(self.saveAsButton)
+
+            button_layout.addWidget(QLabel("Max colors on load:"))
+            self.maxColorsSpin = QSpinBox()
+            self.maxColorsSpin.setRange(0, 4096)
+            self.maxColorsSpin.setSpecialValueText("All")
+            self.maxColorsSpin.setToolTip(
+                "Quantize images with more colors than this when loading them; applies to the next image loaded"
+            )
+            self.maxColorsSpin.valueChanged.connect(self.set_max_colors)
+            button_layout.addWidget(self.maxColorsSpin)
         
             self.layout.addLayout(button_layout)
 
-        self.scrollArea = QScrollArea()
-        self.scrollArea.setWidgetResizable(False)
-        self.scrollArea.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.scrollArea.installEventFilter(self)
-
-        self.imageLabel = QLabel()
-        self.imageLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.imageLabel.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
-        self.imageLabel.setScaledContents(False)
-        self.imageLabel.setMouseTracking(True)
-        self.imageLabel.mousePressEvent = self.image_mouse_click
-        self.imageLabel.mouseMoveEvent = self.image_mouse_move
-        self.imageLabel.leaveEvent = self.image_mouse_leave
-
-        self.scrollArea.setWidget(self.imageLabel)
-        self.layout.addWidget(self.scrollArea, stretch=1)
+        # The view scales the unscaled image itself and only draws what is visible
+        self.scene = QGraphicsScene(self)
+        self.image_item = ImageBufferItem()
+        self.highlight_item = QGraphicsPixmapItem()
+        self.highlight_item.setTransformationMode(Qt.TransformationMode.FastTransformation)
+        self.highlight_item.setZValue(1)
+        self.highlight_item.hide()
+        self.scene.addItem(self.image_item)
+        self.scene.addItem(self.highlight_item)
+
+        self.imageView = QGraphicsView(self.scene)
+        self.imageView.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.imageView.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, False)
+        self.imageView.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.SmartViewportUpdate)
+        self.imageView.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.imageView.viewport().setMouseTracking(True)
+        self.imageView.viewport().installEventFilter(self)
+        self.layout.addWidget(self.imageView, stretch=1)
 
         self._setup_zoom_controls()
+        self._setup_frame_controls()
         self._setup_color_overlay()
 
         self.color_palette = ColorPalette(self)
@@ -73,8 +132,22 @@ class ImageViewer(QWidget):
         hbox.addWidget(self.zoomSlider)
         self.layout.addLayout(hbox)
 
+    def _setup_frame_controls(self):
+        # Only shown for animations
+        self.frameControls = QWidget()
+        hbox = QHBoxLayout(self.frameControls)
+        hbox.setContentsMargins(0, 0, 0, 0)
+        self.frameLabel = QLabel("Frame 1/1")
+        self.frameSlider = QSlider(Qt.Orientation.Horizontal)
+        self.frameSlider.setRange(0, 0)
+        self.frameSlider.valueChanged.connect(self.show_frame)
+        hbox.addWidget(self.frameLabel)
+        hbox.addWidget(self.frameSlider)
+        self.frameControls.hide()
+        self.layout.addWidget(self.frameControls)
+
     def _setup_color_overlay(self):
-        self.colorDetails = QWidget(self.scrollArea)
+        self.colorDetails = QWidget(self.imageView)
         self.colorDetails.setMinimumWidth(160)
         self.colorDetails.setStyleSheet("""
             background-color: white;
@@ -112,47 +185,147 @@ class ImageViewer(QWidget):
 
         self.colorDetails.hide()
 
-    def load_image(self, pixmap = None, file_path=None):
-        if pixmap:
-            self.original_pixmap = pixmap
+    def load_image(self, pixmap = None, file_path=None, palette=None, durations=None):
+        """
+        Show an image from `pixmap`, `file_path` or a file dialog. A `palette` that the
+        color manager already holds (all frames, with `durations`) is shown as is, so
+        its color ids stay the ones every other view uses.
+        """
+        shared = palette is not None
+        if shared:
+            durations = durations or [0] * len(palette.frames)
+        elif pixmap:
+            if pixmap.isNull():
+                return
+            palette = core.Palette.from_image(self._pixmap_to_array(pixmap))
+            durations = [0]
         else:
             if not file_path:
                 from PyQt6.QtWidgets import QFileDialog
-                file_path, _ = QFileDialog.getOpenFileName(self, "Open Image", "", "Images (*.png *.jpg *.bmp)")
+                file_path, _ = QFileDialog.getOpenFileName(self, "Open Image", "", "Images (*.png *.gif *.jpg *.bmp)")
                 if not file_path:
                     return
-            self.original_pixmap = QPixmap(file_path)
+            # Indexed PNGs and GIFs are read through their palette, without grouping pixels;
+            # all frames of an animation share that palette
+            try:
+                palette, durations = core.load_animation(file_path)
+            except OSError as e:
+                QMessageBox.warning(self, "Load Error", f"Failed to load image: {str(e)}")
+                return
+
+        # High-color images (photos, JPEGs) would give an unusable number of colors
+        color_map = None
+        if not shared and self.max_colors and len(palette) > self.max_colors:
+            palette, color_map = core.quantize(palette, self.max_colors, self.quantize_method)
 
         self.current_image_path = file_path
+        self.color_map = color_map
+
+        self._set_buffer(palette.to_rgba())
+        self.original_pixmap = pixmap if pixmap else QPixmap.fromImage(self.image)
+        if not shared:
+            global_color_manager.load_palette(palette)
+        color_groups = global_color_manager.get_color_groups()
+        self._set_palette_image(palette.frames, palette.colors)
+        self.frame_durations = durations
+        self._reset_frame_controls()
+        self.color_palette.populate(color_groups, square_size=self.palette_square_size)
+        self.set_initial_fit_zoom()
+        self.update_image()
+        global_selection_manager.clear_selection()
+        self.reset_color_details()
 
-        if not self.original_pixmap.isNull():
-            self.image_array = self.get_image_array()
-            global_color_manager.load_image(self.image_array)
-            color_groups = global_color_manager.get_color_groups()
-            self.color_palette.populate(color_groups, square_size=self.palette_square_size)
-            self.set_initial_fit_zoom()
-            self.update_image()
-            global_selection_manager.clear_selection()
-            self.reset_color_details()
+        if self.show_load_button:
+            self.saveAsButton.setEnabled(True)
 
-            if self.show_load_button:
-                self.saveAsButton.setEnabled(True)
+    def set_max_colors(self, max_colors):
+        """Quantize images loaded from now on to at most `max_colors` colors, 0 to keep them all."""
+        self.max_colors = max_colors
 
-    def replace_color(self, color_id, new_color):
-        if self.original_pixmap is None or color_id not in global_color_manager.color_groups:
+    @staticmethod
+    def _pixmap_to_array(pixmap):
+        qimage = pixmap.toImage().convertToFormat(QImage.Format.Format_RGBA8888)
+        ptr = qimage.bits()
+        ptr.setsize(qimage.sizeInBytes())
+        rows = np.frombuffer(ptr, dtype=np.uint8).reshape(qimage.height(), qimage.bytesPerLine())
+        return rows[:, :qimage.width() * 4].reshape(qimage.height(), qimage.width(), 4).copy()
+
+    def _set_buffer(self, image_array):
+        """
+        Make `image_array` the displayed image. The QImage wraps the array's memory
+        without copying, so the array is kept alongside it for as long as it is shown.
+        """
+        image_array = np.ascontiguousarray(image_array, dtype=np.uint8)
+        height, width = image_array.shape[:2]
+        image = QImage(image_array.data, width, height, width * 4, QImage.Format.Format_RGBA8888)
+        self.image_item.set_image(image)
+        self.scene.setSceneRect(QRectF(0, 0, width, height))
+        self.image_array, self.image = image_array, image
+
+    def _set_palette_image(self, frames, colors):
+        """Keep the color id of every pixel plus a lookup table, so a recolor rewrites only its own pixels."""
+        self.frames = frames
+        self.frame_index = 0
+        self.label_map = frames[0]
+        # The extra last row keeps transparent pixels (label -1) transparent
+        self.lut = np.zeros((len(colors) + 1, 4), dtype=np.uint8)
+        self.lut[:len(colors)] = np.array(colors, dtype=np.uint8).reshape(-1, 4)
+        self.color_bounds = core.Palette(colors, frames[0], frames).bounding_boxes()
+        self._mask_cache.clear()
+
+    def _reset_frame_controls(self):
+        frame_count = len(self.frames)
+        self.frameSlider.blockSignals(True)
+        self.frameSlider.setRange(0, frame_count - 1)
+        self.frameSlider.setValue(0)
+        self.frameSlider.blockSignals(False)
+        self.frameLabel.setText(f"Frame 1/{frame_count}")
+        self.frameControls.setVisible(frame_count > 1)
+
+    def show_frame(self, index):
+        """Display frame `index` of an animation, in the current colors."""
+        if self.frames is None or not 0 <= index < len(self.frames) or index == self.frame_index:
             return
+        self.frame_index = index
+        self.label_map = self.frames[index]
+        global_color_manager.set_frame(index)
+        self.frameLabel.setText(f"Frame {index + 1}/{len(self.frames)}")
+
+        # The lookup table holds every recolor, so each frame renders in the current colors
+        height, width = self.label_map.shape
+        self._redraw_region(0, 0, width, height)
+        self._mask_cache.clear()
+        hovered_color_id = global_selection_manager.hovered_color_id
+        if hovered_color_id is not None and self.highlight_item.isVisible():
+            self.update_image_highlight(hovered_color_id)
 
-        positions = global_color_manager.color_groups[color_id].pixel_positions
+    def _redraw_region(self, x0, y0, x1, y1):
+        """Re-render pixels [y0:y1, x0:x1] from the lookup table, in place, and repaint just them."""
+        x0, y0, x1, y1 = int(x0), int(y0), int(x1), int(y1)
+        self.image_array[y0:y1, x0:x1] = self.lut[self.label_map[y0:y1, x0:x1]]
+        self.image_item.update(QRectF(x0, y0, x1 - x0, y1 - y0))
 
-        for x, y in positions:
-            self.image_array[y, x] = new_color
+    def current_pixmap(self):
+        """A pixmap of the image with all recolors applied."""
+        if self.image is None:
+            return self.original_pixmap
+        return QPixmap.fromImage(self.image)
 
-        img = QImage(self.image_array.data,
-                     self.image_array.shape[1],
-                     self.image_array.shape[0],
-                     QImage.Format.Format_RGBA8888)
-        self.original_pixmap = QPixmap.fromImage(img)
-        self.update_image()
+    def replace_color(self, color_id, new_color):
+        self.recolor({color_id: new_color})
+
+    def recolor(self, colors):
+        """Set the color of every color id in `colors`, then redraw the pixels they cover."""
+        if self.image is None or self.lut is None:
+            return
+        ids = [color_id for color_id in colors if 0 <= color_id < len(self.color_bounds)]
+        if not ids:
+            return
+        self.lut[ids] = [colors[color_id] for color_id in ids]
+
+        # Each color only within its own bounding box, so small colors stay cheap on big images
+        for color_id in ids:
+            self._redraw_region(*self.color_bounds[color_id])
 
     def update_image(self):
         if not self.original_pixmap:
@@ -160,18 +333,8 @@ class ImageViewer(QWidget):
         zoom = self.get_zoom_factor()
         self.zoomLabel.setText(f"{zoom}x")
 
-        scaled_width = int(self.original_pixmap.width() * zoom)
-        scaled_height = int(self.original_pixmap.height() * zoom)
-
-        scaled_pixmap = self.original_pixmap.scaled(
-            scaled_width,
-            scaled_height,
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.FastTransformation
-        )
-
-        self.imageLabel.setPixmap(scaled_pixmap)
-        self.imageLabel.resize(scaled_width, scaled_height)
+        self.highlight_item.hide()
+        self.imageView.setTransform(QTransform.fromScale(zoom, zoom))
 
     def get_zoom_factor(self):
         base_zoom = 1.16 ** (self.zoomSlider.value() - 20)
@@ -180,19 +343,15 @@ class ImageViewer(QWidget):
     def set_initial_fit_zoom(self):
         if not self.original_pixmap:
             return
-        container_size = self.scrollArea.size()
+        container_size = self.imageView.viewport().size()
         image_size = self.original_pixmap.size()
         zoom = min(container_size.width() / image_size.width(), container_size.height() / image_size.height())
         slider_val = max(1, int(round(math.log(zoom) / math.log(1.16) + 20)) - 2)
         self.zoomSlider.setValue(max(self.zoomSlider.minimum(), min(slider_val, self.zoomSlider.maximum())))
 
     def get_image_array(self):
-        if not self.original_pixmap:
-            return None
-        qimage = self.original_pixmap.toImage().convertToFormat(QImage.Format.Format_RGBA8888)
-        ptr = qimage.bits()
-        ptr.setsize(qimage.sizeInBytes())
-        return np.array(ptr, dtype=np.uint8).reshape((qimage.height(), qimage.width(), 4))
+        """The displayed RGBA buffer itself, not a copy; treat it as read-only."""
+        return self.image_array
 
     def on_selection_change(self, selected_color_id, hovered_color_id):
         selected_color = None
@@ -228,43 +387,52 @@ class ImageViewer(QWidget):
         self.colorTextHSV.setText("HSV: -")
         self.colorDetails.hide()
 
+    def highlight_mask(self, color_id, highlight_color):
+        """
+        The pixels of `color_id` in `highlight_color`, transparent elsewhere, and where
+        to place them. Recently used masks are cached.
+        """
+        key = (color_id, highlight_color)
+        if key in self._mask_cache:
+            self._mask_cache.move_to_end(key)
+            return self._mask_cache[key]
+
+        # Only as large as the color's bounding box, placed at its top left corner
+        x0, y0, x1, y1 = (int(v) for v in self.color_bounds[color_id])
+        argb = np.uint32(QColor(highlight_color).rgba())
+        mask = np.where(self.label_map[y0:y1, x0:x1] == color_id, argb, np.uint32(0)).astype(np.uint32)
+        height, width = mask.shape
+        image = QImage(mask.data, width, height, width * 4, QImage.Format.Format_ARGB32)
+        entry = (QPixmap.fromImage(image), QPointF(x0, y0))
+
+        self._mask_cache[key] = entry
+        if len(self._mask_cache) > self.MASK_CACHE_SIZE:
+            self._mask_cache.popitem(last=False)
+        return entry
+
     def update_image_highlight(self, color_id):
-        if not self.original_pixmap or color_id is None:
+        if not self.original_pixmap or color_id is None or self.label_map is None:
             return
-
-        image = self.original_pixmap.toImage().convertToFormat(QImage.Format.Format_RGBA8888)
-        highlighted = QImage(image)
-        highlight_color = QColor(global_selection_manager.highlight_color)
-
-        positions = global_color_manager.color_groups[color_id].pixel_positions
-
-        for x, y in positions:
-            highlighted.setPixelColor(x, y, highlight_color)
-
-        zoom = self.get_zoom_factor()
-        scaled_pixmap = QPixmap.fromImage(highlighted).scaled(
-            int(image.width() * zoom),
-            int(image.height() * zoom),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.FastTransformation
-        )
-        self.imageLabel.setPixmap(scaled_pixmap)
+        pixmap, offset = self.highlight_mask(color_id, global_selection_manager.highlight_color)
+        self.highlight_item.setPixmap(pixmap)
+        self.highlight_item.setOffset(offset)
+        self.highlight_item.show()
 
     def image_mouse_move(self, event):
-        coord = self.get_pixel_coordinates_at_pos(event.pos())
+        coord = self.get_pixel_coordinates_at_pos(event.position().toPoint())
         if coord:
             x, y = coord
-            color_id = global_color_manager.get_color_id_at_position(x, y)
+            color_id = int(self.label_map[y, x])
             if color_id >= 0:
                 global_selection_manager.hover_color_id(color_id)
                 return
         global_selection_manager.clear_hover()
 
     def image_mouse_click(self, event):
-        coord = self.get_pixel_coordinates_at_pos(event.pos())
+        coord = self.get_pixel_coordinates_at_pos(event.position().toPoint())
         if coord:
             x, y = coord
-            color_id = global_color_manager.get_color_id_at_position(x, y)
+            color_id = int(self.label_map[y, x])
             if color_id >= 0:
                 global_selection_manager.select_color_id(color_id)
                 return
@@ -275,16 +443,12 @@ class ImageViewer(QWidget):
         global_selection_manager.clear_hover()
 
     def get_pixel_coordinates_at_pos(self, pos):
-        if not self.original_pixmap or not self.imageLabel.pixmap():
+        """Image pixel under `pos`, a position in the view's viewport."""
+        if not self.original_pixmap:
             return None
 
-        label = self.imageLabel
-        zoom = self.get_zoom_factor()
-        offset_x = (label.width() - self.original_pixmap.width() * zoom) // 2
-        offset_y = (label.height() - self.original_pixmap.height() * zoom) // 2
-
-        x = int((pos.x() - offset_x) / zoom)
-        y = int((pos.y() - offset_y) / zoom)
+        point = self.imageView.mapToScene(pos)
+        x, y = math.floor(point.x()), math.floor(point.y())
 
         if 0 <= x < self.original_pixmap.width() and 0 <= y < self.original_pixmap.height():
             return x, y
@@ -292,10 +456,15 @@ class ImageViewer(QWidget):
         return None
 
     def eventFilter(self, obj, event):
-        if obj == self.scrollArea and event.type() == QtCore.QEvent.Type.MouseButtonPress:
-            clicked_widget = self.childAt(event.position().toPoint())
-            if clicked_widget not in [self.imageLabel, self.colorDetails]:
-                global_selection_manager.clear_selection()
+        if obj == self.imageView.viewport():
+            if event.type() == QtCore.QEvent.Type.MouseMove:
+                self.image_mouse_move(event)
+            elif event.type() == QtCore.QEvent.Type.MouseButtonPress:
+                # Clicking next to the image clears the selection
+                self.image_mouse_click(event)
+                return True
+            elif event.type() == QtCore.QEvent.Type.Leave:
+                self.image_mouse_leave(event)
         return super().eventFilter(obj, event)
 
     def cleanup(self):
@@ -324,13 +493,14 @@ class ImageViewer(QWidget):
             self,
             "Save Image As",
             suggested_name,
-            "Images (*.png *.jpg *.bmp)"
+            "Images (*.png *.gif *.jpg *.bmp)"
         )
         
-        if file_path:
-            # Convert the current image array to QImage and save
-            img = QImage(self.image_array.data,
-                        self.image_array.shape[1],
-                        self.image_array.shape[0],
-                        QImage.Format.Format_RGBA8888)
-            img.save(file_path)
\ No newline at end of file
+        if not file_path:
+            return
+        if len(self.frames) > 1 and file_path.lower().endswith(".gif"):
+            # Every frame, recolored through the lookup table (its last row is the transparent one)
+            core.save_animation(file_path, self.frames, self.lut[:-1], self.frame_durations)
+        else:
+            # The displayed QImage already wraps the current image array
+            self.image.save(file_path)
\ No newline at end of file
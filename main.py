@@ -1,9 +1,21 @@
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
 import sys
 import traceback
 
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
 from main_window import MainWindow
 
+IMPORTED = time.perf_counter()
+
+# Opened at startup unless another image or --empty is given
+DEFAULT_IMAGE = "resources/harvest.png"
+DEFAULT_COLOR_DATA = "resources/exports/harvest_ramps3.json"
+
 def handle_exception(exc_type, exc_value, exc_traceback):
     if issubclass(exc_type, KeyboardInterrupt):
         sys.__excepthook__(exc_type, exc_value, exc_traceback)
@@ -13,10 +25,40 @@ def handle_exception(exc_type, exc_value, exc_traceback):
 
 sys.excepthook = handle_exception
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pixel Art Color Processor")
+    parser.add_argument("image", nargs="?", help=f"image to open at startup (default: {DEFAULT_IMAGE})")
+    parser.add_argument("--ramps", help="color data file (.npz or .json) with ramps for the image")
+    parser.add_argument("--empty", action="store_true", help="start without opening an image")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="print how long each startup step took, then exit")
+    # Anything else is left for Qt (-platform, -style, ...)
+    return parser.parse_known_args(argv)
+
 def main():
-    app = QApplication(sys.argv)
+    args, qt_args = parse_args()
+    image_path, color_data_path = args.image, args.ramps
+    if not image_path and not args.empty:
+        image_path, color_data_path = DEFAULT_IMAGE, color_data_path or DEFAULT_COLOR_DATA
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = MainWindow()
     window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+
+    # The window is up before the startup project loads
+    def open_startup_project():
+        if image_path:
+            window.open_project(image_path, color_data_path)
+        if args.startup_time:
+            loaded = time.perf_counter()
+            print(f"imports          {(IMPORTED - STARTED) * 1000:8.1f} ms")
+            print(f"window shown     {(shown - STARTED) * 1000:8.1f} ms")
+            print(f"project loaded   {(loaded - STARTED) * 1000:8.1f} ms")
+            app.quit()
+
+    QTimer.singleShot(0, open_startup_project)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -10,11 +10,11 @@ from PyQt6.QtWidgets import (
     QHBoxLayout, QScrollArea, QFileDialog, QMessageBox, QGroupBox, QRadioButton, QComboBox, QCheckBox
 )
 
+import core
 from colorpicker import ColorPicker
 from global_managers import global_selection_manager, global_ramp_manager, global_color_manager
 from image_viewer import ImageViewer
 from palette import ColorRamp
-from ramp_extraction_window import RampWindow
 
 
 class MainWindow(QMainWindow):
@@ -130,9 +130,6 @@ class MainWindow(QMainWindow):
         self.viewer.colorDetails.hide()  # Permanently hide overlay
         main_layout.addWidget(self.viewer, stretch=1)
 
-        self.viewer.load_image(file_path="resources/harvest.png")
-        self.import_color_data("resources/exports/harvest_ramps3.json")
-
         self.viewer.loadButton.clicked.connect(self.on_new_image_loaded)
 
         # Listen for color changes
@@ -140,6 +137,13 @@ class MainWindow(QMainWindow):
         global_ramp_manager.register_listener(self.update_button_states)
         self.update_button_states()
 
+    def open_project(self, image_path, color_data_path=None):
+        """Load an image, and the ramps saved for it if given."""
+        self.viewer.load_image(file_path=image_path)
+        if color_data_path:
+            self.import_color_data(color_data_path)
+        self.update_button_states()
+
     def _on_preserve_style_changed(self, new_style):
         self._on_picker_color_changed(refresh=True)
 
@@ -249,7 +253,7 @@ class MainWindow(QMainWindow):
             cid_list = [cid for cid, _ in self._active_ramp_backup[ramp_key]]
             for cid, new_col in zip(cid_list, new_rgb_ramp):
                  global_color_manager.set_color(cid, new_col)
-                 self.viewer.replace_color(cid, new_col)
+            self.viewer.recolor(dict(zip(cid_list, new_rgb_ramp)))
 
         # Add these lines to update the color palette
         color_groups = global_color_manager.get_color_groups()
@@ -322,8 +326,11 @@ class MainWindow(QMainWindow):
     def open_ramp_window(self):
         if not self.viewer.original_pixmap:
             return
+        # The extraction window brings in matplotlib and networkx, so it is imported on first use
+        from ramp_extraction_window import RampWindow
+
         global_selection_manager.clear_selection()
-        self.ramp_window = RampWindow(self.viewer.original_pixmap)
+        self.ramp_window = RampWindow(self._current_palette(), self.viewer.frame_durations)
         self.ramp_window.ramps_saved.connect(self.refresh_ramps)
         self.ramp_window.show()
 
@@ -331,23 +338,41 @@ class MainWindow(QMainWindow):
         if not global_ramp_manager.get_ramps():
             return
 
-        suggested_name = "color_ramps.json"
+        suggested_name = "color_ramps.npz"
         if self.viewer.current_image_path:
-            suggested_name = os.path.splitext(os.path.basename(self.viewer.current_image_path))[0] + "_ramps.json"
+            suggested_name = os.path.splitext(os.path.basename(self.viewer.current_image_path))[0] + "_ramps.npz"
 
-        file_path, _ = QFileDialog.getSaveFileName(
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self,
             "Save Color Data",
             suggested_name,
-            "Color Data Files (*.json)"
+            "Color Data Files (*.npz);;Legacy Color Data Files (*.json)"
         )
         
         if not file_path:
             return
-        
+
+        try:
+            if file_path.lower().endswith(".json") or selected_filter.startswith("Legacy"):
+                with open(file_path, 'w') as f:
+                    json.dump(self._legacy_color_data(), f)
+            else:
+                # Labels, colors and ramps only; positions follow from the labels
+                core.save_project(file_path, self._current_palette(), global_ramp_manager.get_ramps())
+        except Exception as e:
+            QMessageBox.critical(self, "Export Error", f"Failed to export color data: {str(e)}")
+
+    def _current_palette(self):
+        colors = [group.current_color for _, group in sorted(global_color_manager.color_groups.items())]
+        frames = global_color_manager.frames
+        return core.Palette(colors, frames[0], frames)
+
+    def _legacy_color_data(self):
+        # Header and ramps first, so an import can stop reading before the positions
         data = {
-            'colors': {},
-            'ramps': []
+            'header': core.project_header(self._current_palette()),
+            'ramps': [],
+            'colors': {}
         }
         
         # Save color groups, converting numpy.uint8 to int
@@ -368,12 +393,7 @@ class MainWindow(QMainWindow):
                     ramp_colors.append(color)
             ramps.append(ramp_colors)
         data['ramps'] = ramps
-        
-        try:
-            with open(file_path, 'w') as f:
-                json.dump(data, f)
-        except Exception as e:
-            QMessageBox.critical(self, "Export Error", f"Failed to export color data: {str(e)}")
+        return data
 
     def import_color_data(self, file_path=None):
         if not self.viewer.original_pixmap:
@@ -384,27 +404,50 @@ class MainWindow(QMainWindow):
                 self,
                 "Load Color Data",
                 "",
-                "Color Data Files (*.json)"
+                "Color Data Files (*.npz *.json)"
             )
 
         if not file_path or not os.path.exists(file_path):
             return
 
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
+            if file_path.lower().endswith(".npz"):
+                palette, ramps, header = core.load_project(file_path)
+                imported_colors = None
+                if header is None:
+                    # Files saved before the digests were added
+                    imported_colors = {str(cid): color for cid, color in enumerate(palette.colors)}
+            else:
+                # Positions are only parsed for old files without a header
+                header, imported_ramps, colors = core.read_color_data(file_path)
+                imported_colors = None
+                if header is None:
+                    imported_colors = {
+                        cid: tuple(group['color'])
+                        for cid, group in colors.items()
+                    }
+
+                ramps = []
+                for ramp in imported_ramps:
+                    ramp_colors = []
+                    for color in ramp:
+                        if isinstance(color, (list, tuple)):
+                            ramp_colors.append(tuple(color))
+                        else:
+                            ramp_colors.append(color)
+                    ramps.append(ramp_colors)
             
-            # Verify colors match current image
-            current_colors = {
-                str(cid): tuple(int(x) for x in group.current_color)
-                for cid, group in global_color_manager.color_groups.items()
-            }
-            imported_colors = {
-                cid: tuple(group['color'])
-                for cid, group in data['colors'].items()
-            }
+            # Verify colors match current image, by hash when the file has them
+            if header is not None:
+                matches = core.headers_match(header, core.project_header(self._current_palette()))
+            else:
+                current_colors = {
+                    str(cid): tuple(int(x) for x in group.current_color)
+                    for cid, group in global_color_manager.color_groups.items()
+                }
+                matches = current_colors == imported_colors
 
-            if current_colors != imported_colors:
+            if not matches:
                 QMessageBox.critical(
                     self,
                     "Import Error",
@@ -412,17 +455,6 @@ class MainWindow(QMainWindow):
                 )
                 return
 
-            # Import ramps
-            ramps = []
-            for ramp in data['ramps']:
-                ramp_colors = []
-                for color in ramp:
-                    if isinstance(color, (list, tuple)):
-                        ramp_colors.append(tuple(color))
-                    else:
-                        ramp_colors.append(color)
-                ramps.append(ramp_colors)
-
             global_ramp_manager._ramps = ramps
             global_ramp_manager._notify()
 
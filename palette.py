@@ -1,14 +1,19 @@
-from PyQt6.QtGui import QPainter, QPen
-from PyQt6.QtWidgets import QLabel, QWidget, QHBoxLayout
-from PyQt6.QtCore import Qt, QEvent, QTimer
+from PyQt6.QtGui import QPainter, QPen, QColor
+from PyQt6.QtWidgets import QLabel, QWidget, QHBoxLayout, QSizePolicy, QListView, QStyledItemDelegate, QAbstractItemView
+from PyQt6.QtCore import Qt, QEvent, QTimer, QAbstractListModel, QModelIndex, QRect, QRectF, QSize
 
-from hsv_graph import HSVGraphWindow
-from ui_helpers import FlowLayout
 from color_utils import get_highlight_color
 from global_managers import ColorSelectionManager, ColorRampManager, global_selection_manager, global_ramp_manager, \
     ColorGroup, global_color_manager
 
 
+def draw_inner_border(painter, rect, color, width):
+    # Drawn inside the rect, like a stylesheet border
+    painter.setPen(QPen(QColor(color), width))
+    painter.setBrush(Qt.BrushStyle.NoBrush)
+    painter.drawRect(QRectF(rect).adjusted(width / 2, width / 2, -width / 2, -width / 2))
+
+
 class ColorLabel(QLabel):
     def __init__(self, color_group: ColorGroup, size=40, show_border=True, parent=None):
         super().__init__(parent)
@@ -19,7 +24,7 @@ class ColorLabel(QLabel):
         self.setCursor(Qt.CursorShape.PointingHandCursor)
         self.set_default_border()
         self.set_background_color()
-        global_selection_manager.register_listener(self.on_selection_changed)
+        global_selection_manager.subscribe(color_group.color_id, self.on_selection_changed)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -38,6 +43,7 @@ class ColorLabel(QLabel):
         if getattr(ramp, "source", None) == "final" and hasattr(ramp, "viewer") and ramp.viewer:
             if ramp.viewer.tool_active("add_remove") or ramp.viewer.tool_active("split"):
                 self.tool_hovered = True
+                self._restyle()
         global_selection_manager.hover_color_id(self.color_group.color_id)
 
     def leaveEvent(self, event):
@@ -45,8 +51,13 @@ class ColorLabel(QLabel):
         if getattr(ramp, "source", None) == "final" and hasattr(ramp, "viewer") and ramp.viewer:
             if ramp.viewer.tool_active("add_remove") or ramp.viewer.tool_active("split"):
                 self.tool_hovered = False
+                self._restyle()
         global_selection_manager.clear_hover()
 
+    def _restyle(self):
+        # The tool border is this label's own state, the selection manager may not report a change for it
+        self.on_selection_changed(global_selection_manager.selected_color_id, global_selection_manager.hovered_color_id)
+
     def on_selection_changed(self, selected_id, hovered_id):
         ramp = self.parent()
         tool_active = getattr(ramp, "source", None) == "final" and hasattr(ramp, "viewer") and ramp.viewer and ramp.viewer.tool_active_any()
@@ -82,17 +93,31 @@ class ColorLabel(QLabel):
         self.setStyleSheet(self.styleSheet() + f"; background-color: rgba({r},{g},{b},{a})")
 
     def deleteLater(self):
-        global_selection_manager.unregister_listener(self.on_selection_changed)
+        global_selection_manager.unsubscribe(self.color_group.color_id, self.on_selection_changed)
         super().deleteLater()
 
 
 class ColorPalette(QWidget):
-    def __init__(self, parent=None):
+    """
+    All colors of a palette painted as wrapped rows of swatches, in one widget.
+
+    Hovering and clicking a swatch hover and select its color through the selection
+    manager, like `ColorLabel`; only swatches whose state changed are repainted.
+    """
+
+    def __init__(self, parent=None, spacing=5):
         super().__init__(parent)
-        self.labels = {}
-        self.layout = FlowLayout(spacing=5)
-        self.layout.setContentsMargins(0, 0, 0, 0)
-        self.setLayout(self.layout)
+        self.color_groups = []
+        self.square_size = 40
+        self.spacing = spacing
+        self._indices = {}
+        self._hovered_index = None
+        self._highlighted = (None, None)
+        self.setMouseTracking(True)
+
+        policy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
+        policy.setHeightForWidth(True)
+        self.setSizePolicy(policy)
 
     def populate(self, color_groups, square_size=40, sort=False):
         self.clear()
@@ -106,16 +131,124 @@ class ColorPalette(QWidget):
         else:
             sorted_groups = color_groups
 
-        for group in sorted_groups:
-            label = ColorLabel(group, size=square_size)
-            self.labels[group.color_id] = label
-            self.layout.addWidget(label)
+        self.color_groups = list(sorted_groups)
+        self.square_size = square_size
+        self._indices = {group.color_id: i for i, group in enumerate(self.color_groups)}
+        self._highlighted = (global_selection_manager.selected_color_id, global_selection_manager.hovered_color_id)
+        global_selection_manager.register_listener(self.on_selection_changed)
+        self.updateGeometry()
+        self.update()
 
     def clear(self):
-        for label in self.labels.values():
-            self.layout.removeWidget(label)
-            label.deleteLater()
-        self.labels.clear()
+        global_selection_manager.unregister_listener(self.on_selection_changed)
+        self.color_groups = []
+        self._indices = {}
+        self._hovered_index = None
+        self.updateGeometry()
+        self.update()
+
+    def color_ids(self):
+        return list(self._indices)
+
+    def _columns(self, width=None):
+        width = self.width() if width is None else width
+        return max(1, (width + self.spacing) // (self.square_size + self.spacing))
+
+    def _swatch_rect(self, index):
+        step = self.square_size + self.spacing
+        row, column = divmod(index, self._columns())
+        return QRect(column * step, row * step, self.square_size, self.square_size)
+
+    def _index_at(self, pos):
+        step = self.square_size + self.spacing
+        column, x = divmod(pos.x(), step)
+        row, y = divmod(pos.y(), step)
+        if x >= self.square_size or y >= self.square_size or column >= self._columns():
+            return None
+        index = row * self._columns() + column
+        return index if 0 <= index < len(self.color_groups) else None
+
+    def hasHeightForWidth(self):
+        return True
+
+    def heightForWidth(self, width):
+        if not self.color_groups:
+            return 0
+        rows = -(-len(self.color_groups) // self._columns(width))
+        return rows * (self.square_size + self.spacing) - self.spacing
+
+    def sizeHint(self):
+        return QSize(self.square_size, self.heightForWidth(self.width()))
+
+    def minimumSizeHint(self):
+        return QSize(self.square_size, 0)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.updateGeometry()
+
+    def paintEvent(self, event):
+        if not self.color_groups:
+            return
+        painter = QPainter(self)
+        step = self.square_size + self.spacing
+        columns = self._columns()
+        first_row = max(0, event.rect().top() // step)
+        last_row = event.rect().bottom() // step
+        first = first_row * columns
+        last = min(len(self.color_groups), (last_row + 1) * columns)
+
+        selected_id, hovered_id = self._highlighted
+        for index in range(first, last):
+            group = self.color_groups[index]
+            rect = self._swatch_rect(index)
+            color = group.current_color
+            painter.fillRect(rect, QColor(*color))
+            if group.color_id == hovered_id:
+                draw_inner_border(painter, rect, global_selection_manager.highlight_color, 3)
+            elif group.color_id == selected_id:
+                draw_inner_border(painter, rect, get_highlight_color(color), 5)
+            else:
+                draw_inner_border(painter, rect, "#000", 1)
+
+    def on_selection_changed(self, selected_id, hovered_id):
+        previous_selected, previous_hovered = self._highlighted
+        self._highlighted = (selected_id, hovered_id)
+
+        # Repaint only the swatches whose selected or hovered state changed
+        for color_id in {previous_selected, previous_hovered, selected_id, hovered_id}:
+            was = (color_id == previous_selected, color_id == previous_hovered)
+            now = (color_id == selected_id, color_id == hovered_id)
+            index = self._indices.get(color_id)
+            if was != now and index is not None:
+                self.update(self._swatch_rect(index))
+
+    def mousePressEvent(self, event):
+        index = self._index_at(event.position().toPoint())
+        if event.button() == Qt.MouseButton.LeftButton and index is not None:
+            global_selection_manager.select_color_id(self.color_groups[index].color_id)
+        else:
+            event.ignore()
+
+    def mouseMoveEvent(self, event):
+        index = self._index_at(event.position().toPoint())
+        if index == self._hovered_index:
+            return
+        self._hovered_index = index
+        if index is None:
+            self.unsetCursor()
+            global_selection_manager.clear_hover()
+        else:
+            self.setCursor(Qt.CursorShape.PointingHandCursor)
+            global_selection_manager.hover_color_id(self.color_groups[index].color_id)
+
+    def leaveEvent(self, event):
+        if self._hovered_index is not None:
+            self._hovered_index = None
+            self.unsetCursor()
+            global_selection_manager.clear_hover()
+        super().leaveEvent(event)
+
 
 class ColorRamp(QWidget):
     _hsv_windows = []
@@ -207,20 +340,27 @@ class ColorRamp(QWidget):
         if hsv_window in ColorRamp._hsv_windows:
             ColorRamp._hsv_windows.remove(hsv_window)
 
-    def mouseDoubleClickEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
-            color_groups = global_color_manager.get_color_groups()
-            colors = [color_groups[color_id] for color_id in self.color_ramp]
+    @staticmethod
+    def open_hsv_window(color_ramp):
+        color_groups = global_color_manager.get_color_groups()
+        colors = [color_groups[color_id] for color_id in color_ramp]
 
-            # Create and show a new HSV graph window
-            hsv_window = HSVGraphWindow([c.current_color for c in colors])
-            hsv_window.setWindowTitle(f"HSV Progression")
+        # matplotlib is only imported once a graph is opened
+        from hsv_graph import HSVGraphWindow
 
-            # When window is closed, remove it from our list
-            hsv_window.destroyed.connect(self.cleanup_hsv_windows)
+        # Create and show a new HSV graph window
+        hsv_window = HSVGraphWindow([c.current_color for c in colors])
+        hsv_window.setWindowTitle(f"HSV Progression")
 
-            ColorRamp._hsv_windows.append(hsv_window)
-            hsv_window.show()
+        # When window is closed, remove it from our list
+        hsv_window.destroyed.connect(ColorRamp.cleanup_hsv_windows)
+
+        ColorRamp._hsv_windows.append(hsv_window)
+        hsv_window.show()
+
+    def mouseDoubleClickEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.open_hsv_window(self.color_ramp)
 
 
     def _compute_insertion_index(self, x_pos):
@@ -303,3 +443,214 @@ class ColorRamp(QWidget):
                 widget.deleteLater()
         super().deleteLater()
 
+
+class RampListModel(QAbstractListModel):
+    """Candidate ramps, with the ones also among the selected ramps marked as duplicated."""
+    RampRole = Qt.ItemDataRole.UserRole
+    DuplicatedRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ramps = []
+        self._rows = {}
+        self._duplicates = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ramps)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        ramp = self._ramps[index.row()]
+        if role == self.RampRole:
+            return ramp
+        if role == self.DuplicatedRole:
+            return tuple(ramp) in self._duplicates
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{len(ramp)} colors"
+        return None
+
+    def ramps(self):
+        return list(self._ramps)
+
+    def keys(self):
+        return self._rows.keys()
+
+    def set_ramps(self, ramps):
+        self.beginResetModel()
+        self._ramps = list(ramps)
+        self._reindex()
+        self.endResetModel()
+
+    def append_ramps(self, ramps):
+        ramps = [ramp for ramp in ramps if tuple(ramp) not in self._rows]
+        if not ramps:
+            return
+        first = len(self._ramps)
+        self.beginInsertRows(QModelIndex(), first, first + len(ramps) - 1)
+        for row, ramp in enumerate(ramps, start=first):
+            self._ramps.append(ramp)
+            self._rows[tuple(ramp)] = row
+        self.endInsertRows()
+
+    def remove_ramps(self, keys):
+        rows = sorted((self._rows[key] for key in keys if key in self._rows), reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._ramps[row]
+            self.endRemoveRows()
+        self._reindex()
+
+    def set_duplicates(self, keys):
+        changed = self._duplicates ^ set(keys)
+        self._duplicates = set(keys)
+        for key in changed:
+            row = self._rows.get(key)
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [self.DuplicatedRole])
+
+    def _reindex(self):
+        self._rows = {tuple(ramp): row for row, ramp in enumerate(self._ramps)}
+
+
+class RampDelegate(QStyledItemDelegate):
+    """Paints a row of `RampListModel` the way `ColorRamp` and its `ColorLabel`s look."""
+    MARGIN_X = 8
+    MARGIN_Y = 12
+
+    def __init__(self, swatch_size=25, parent=None):
+        super().__init__(parent)
+        self.swatch_size = swatch_size
+        self.hover_row = None
+
+    def sizeHint(self, option, index):
+        ramp = index.data(RampListModel.RampRole)
+        # One extra pixel keeps the rows apart like the spacing of the old layout
+        return QSize(2 * self.MARGIN_X + len(ramp) * self.swatch_size, self.swatch_size + 2 * self.MARGIN_Y + 1)
+
+    def swatch_rect(self, row_rect, i):
+        return QRect(
+            row_rect.left() + self.MARGIN_X + i * self.swatch_size, row_rect.top() + self.MARGIN_Y,
+            self.swatch_size, self.swatch_size
+        )
+
+    def swatch_at(self, row_rect, ramp, pos):
+        for i in range(len(ramp)):
+            if self.swatch_rect(row_rect, i).contains(pos):
+                return i
+        return None
+
+    def paint(self, painter, option, index):
+        ramp = index.data(RampListModel.RampRole)
+        rect = option.rect.adjusted(0, 0, 0, -1)
+
+        painter.save()
+        if index.row() == self.hover_row:
+            background, border = "#eaf7ff", "#88ccee"
+        elif index.data(RampListModel.DuplicatedRole):
+            background, border = "#eeeeee", "#dddddd"
+        else:
+            background, border = None, None
+        if background:
+            painter.fillRect(rect, QColor(background))
+            draw_inner_border(painter, rect, border, 3)
+
+        color_groups = global_color_manager.color_groups
+        selected_id = global_selection_manager.selected_color_id
+        hovered_id = global_selection_manager.hovered_color_id
+        for i, color_id in enumerate(ramp):
+            swatch = self.swatch_rect(rect, i)
+            color = color_groups[color_id].current_color
+            painter.fillRect(swatch, QColor(*color))
+            if color_id == hovered_id:
+                draw_inner_border(painter, swatch, global_selection_manager.highlight_color, 3)
+            elif color_id == selected_id:
+                draw_inner_border(painter, swatch, get_highlight_color(color), 5)
+        painter.restore()
+
+
+class RampListView(QListView):
+    """
+    Candidate ramps as one painted list, so only visible rows cost anything.
+
+    Clicking a swatch selects its color and clicking the rest of a row adds the ramp
+    to the selected ramps, as with `ColorRamp`; double-clicking shows the HSV graph.
+    """
+
+    def __init__(self, swatch_size=25, parent=None):
+        super().__init__(parent)
+        self.ramp_model = RampListModel(self)
+        self.ramp_delegate = RampDelegate(swatch_size, self)
+        self.setModel(self.ramp_model)
+        self.setItemDelegate(self.ramp_delegate)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(500)
+        self.setMouseTracking(True)
+        self._hovered_color = None
+        global_selection_manager.register_listener(self.on_selection_changed)
+
+    def on_selection_changed(self, selected_id, hovered_id):
+        self.viewport().update()
+
+    def _hit(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return index, None, None
+        ramp = index.data(RampListModel.RampRole)
+        swatch = self.ramp_delegate.swatch_at(self.visualRect(index), ramp, pos)
+        return index, ramp, swatch
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton:
+            event.ignore()
+            return
+        index, ramp, swatch = self._hit(event.position().toPoint())
+        if ramp is None:
+            return
+        if swatch is not None:
+            global_selection_manager.select_color_id(ramp[swatch])
+        else:
+            global_ramp_manager.add_ramp(ramp)
+
+    def mouseDoubleClickEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            _, ramp, _ = self._hit(event.position().toPoint())
+            if ramp is not None:
+                ColorRamp.open_hsv_window(ramp)
+
+    def mouseMoveEvent(self, event):
+        index, ramp, swatch = self._hit(event.position().toPoint())
+        self._set_hover_row(index.row() if index.isValid() else None)
+
+        color_id = ramp[swatch] if swatch is not None else None
+        if color_id != self._hovered_color:
+            self._hovered_color = color_id
+            if color_id is None:
+                global_selection_manager.clear_hover()
+            else:
+                global_selection_manager.hover_color_id(color_id)
+
+    def leaveEvent(self, event):
+        self._set_hover_row(None)
+        if self._hovered_color is not None:
+            self._hovered_color = None
+            global_selection_manager.clear_hover()
+        super().leaveEvent(event)
+
+    def _set_hover_row(self, row):
+        previous = self.ramp_delegate.hover_row
+        if row == previous:
+            return
+        self.ramp_delegate.hover_row = row
+        for r in (previous, row):
+            if r is not None and r < self.ramp_model.rowCount():
+                self.viewport().update(self.visualRect(self.ramp_model.index(r)))
+
+    def cleanup(self):
+        global_selection_manager.unregister_listener(self.on_selection_changed)
@@ -1,24 +1,21 @@
-from time import monotonic
-
 import numpy as np
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QSlider, QPushButton,
-    QScrollArea, QSizePolicy, QCheckBox, QGroupBox, QGridLayout, QDialog, QSpacerItem, QFrame, QToolButton, QButtonGroup
+    QScrollArea, QSizePolicy, QCheckBox, QGroupBox, QGridLayout, QDialog, QSpacerItem, QFrame, QToolButton, QButtonGroup,
+    QMessageBox
 )
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal
-from colormath.color_conversions import convert_color
-from colormath.color_objects import sRGBColor, LabColor
-from pyciede2000 import ciede2000
-from sklearn.cluster import AgglomerativeClustering
 
-import global_managers
-from color_utils import color_to_hsv, hsv_diffs, is_similar_hsv, is_similar_ciede2000
+import core
 from global_managers import global_selection_manager, global_ramp_manager, global_color_manager
-from palette import ColorRamp, ColorPalette
-from ui_helpers import VerticalLabel
+from extraction_cache import ExtractionCache
+from palette import ColorRamp, ColorPalette, RampListView
+from ui_helpers import VerticalLabel, BackgroundTask
+
 
 class RampExtractionViewer(QWidget):
     save_ramps = pyqtSignal()
+    stats_updated = pyqtSignal(object)
 
     def _emit_save_signal(self):
         self.save_ramps.emit()
@@ -26,8 +23,12 @@ class RampExtractionViewer(QWidget):
     def __init__(self, graph_viewer, parent=None):
         super().__init__(parent)
         self.graph_viewer = graph_viewer
-        self.generated_ramp_widgets = {}
         self.final_ramp_widgets = {}
+        self.extraction_task = None
+        self.ramp_stream_filter = None
+        self.extraction_stats = None
+        self.extraction_cache = ExtractionCache()
+        self.extraction_cache_key = None
         self.color_groups = global_color_manager.get_color_groups()
         self._setup_ui()
         global_ramp_manager.register_listener(self.refresh_ramp_views)
@@ -65,6 +66,20 @@ class RampExtractionViewer(QWidget):
         self.max_length_slider.valueChanged.connect(
             lambda val: self.max_length_label.setText(f"Max Ramp Length: {val}")
         )
+        self.time_limit_label = QLabel("Time Limit: None")
+        self.time_limit_slider = QSlider(Qt.Orientation.Horizontal)
+        self.time_limit_slider.setRange(0, 300)
+        self.time_limit_slider.setValue(0)
+        self.time_limit_slider.valueChanged.connect(
+            lambda val: self.time_limit_label.setText(f"Time Limit: {val} s" if val else "Time Limit: None")
+        )
+        self.max_candidates_label = QLabel("Max Candidates: None")
+        self.max_candidates_slider = QSlider(Qt.Orientation.Horizontal)
+        self.max_candidates_slider.setRange(0, 100)
+        self.max_candidates_slider.setValue(0)
+        self.max_candidates_slider.valueChanged.connect(
+            lambda val: self.max_candidates_label.setText(f"Max Candidates: {val * 100}" if val else "Max Candidates: None")
+        )
         self.remove_similar_checkbox = QCheckBox("Cluster and Reduce Similar Ramps")
         self.remove_similar_checkbox.setChecked(False)
 
@@ -82,6 +97,10 @@ class RampExtractionViewer(QWidget):
 
         general_layout.addWidget(self.max_length_label)
         general_layout.addWidget(self.max_length_slider)
+        general_layout.addWidget(self.time_limit_label)
+        general_layout.addWidget(self.time_limit_slider)
+        general_layout.addWidget(self.max_candidates_label)
+        general_layout.addWidget(self.max_candidates_slider)
         general_layout.addWidget(self.remove_similar_checkbox)
         general_layout.addWidget(self.skip_reverse_checkbox)
         general_layout.addWidget(self.skip_subsequences_checkbox)
@@ -121,20 +140,14 @@ class RampExtractionViewer(QWidget):
         # --- CENTER: Candidate Ramps ---
         self.ramp_label = QLabel("Candidate Ramps")
         self.generated_ramps = []
-        self.ramps_scroll_area = QScrollArea()
-        self.ramps_scroll_area.setWidgetResizable(True)
-        self.ramp_container = QWidget()
-        self.ramps_layout = QVBoxLayout(self.ramp_container)
-        self.ramps_layout.setSpacing(1)
-        self.ramps_layout.setContentsMargins(10, 10, 10, 10)
-        self.ramps_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.ramps_scroll_area.setWidget(self.ramp_container)
+        self.ramps_view = RampListView()
+        self.ramps_model = self.ramps_view.ramp_model
 
         self.ramp_preview_container = QWidget()
         self.ramp_preview_layout = QVBoxLayout(self.ramp_preview_container)
         self.ramp_preview_layout.setContentsMargins(0, 0, 0, 0)
         self.ramp_preview_layout.addWidget(self.ramp_label)
-        self.ramp_preview_layout.addWidget(self.ramps_scroll_area)
+        self.ramp_preview_layout.addWidget(self.ramps_view)
 
         main_layout.addWidget(self.ramp_preview_container, stretch=2)
 
@@ -217,7 +230,6 @@ class RampExtractionViewer(QWidget):
         # Unused color palette
         self.unused_label = QLabel("Unused Colors:")
         self.unused_palette = ColorPalette()
-        self.unused_palette.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         self.final_ramp_preview_layout.addWidget(self.unused_label)
         self.final_ramp_preview_layout.addWidget(self.unused_palette)
 
@@ -408,101 +420,129 @@ class RampExtractionViewer(QWidget):
 
     def update_extract_button_state(self):
         has_graph = self.graph_viewer.color_graph is not None and len(self.graph_viewer.color_graph.nodes) > 0
-        self.extract_button.setEnabled(has_graph)
+        self.extract_button.setEnabled(has_graph and self.extraction_task is None)
 
     def extract_color_ramps(self):
         graph = self.graph_viewer.color_graph
-        if graph is None:
+        if graph is None or self.extraction_task is not None:
             return
 
         method = self.extraction_method_selector.currentText()
         params = self._get_extraction_params(method)
-        remove_similar = self.remove_similar_checkbox.isChecked()
-        skip_subsequences = self.skip_subsequences_checkbox.isChecked()
-        skip_reverse = self.skip_reverse_checkbox.isChecked()
-        skip_permutations = self.skip_permutations_checkbox.isChecked()
-        max_ramp_length = self.max_length_slider.value()
-
-        # First get all ramps without any filtering
-        ramps = self.find_color_ramps(
-            graph, method, params,
-            max_length=max_ramp_length
+        options = dict(
+            max_length=self.max_length_slider.value(),
+            time_limit=self.time_limit_slider.value(),
+            max_candidates=self.max_candidates_slider.value() * 100,
+            skip_subsequences=self.skip_subsequences_checkbox.isChecked(),
+            skip_reverse=self.skip_reverse_checkbox.isChecked(),
+            skip_permutations=self.skip_permutations_checkbox.isChecked(),
+            remove_similar=self.remove_similar_checkbox.isChecked()
         )
+        graph = graph.copy()
+
+        # Budgets only decide when to stop, they are not part of the request
+        cached_options = {k: v for k, v in options.items() if k not in ('time_limit', 'max_candidates')}
+        colors = global_color_manager.get_colors()
+        node_colors = {color_id: colors[color_id] for color_id in graph.nodes}
+        self.extraction_cache_key = ExtractionCache.make_key(node_colors, graph.edges, method, params, cached_options)
+        stats = core.Stats("extraction")
+        with stats.span("cache lookup"):
+            cached = self.extraction_cache.get(self.extraction_cache_key)
+        if cached is not None:
+            final_ramps, clusters = cached
+            stats.count("cache hits")
+            if clusters is not None:
+                self.show_ramp_clusters(*clusters)
+            self.display_color_ramps(final_ramps)
+            self.ramp_label.setText("Candidate Ramps (cached)")
+            self.stats_updated.emit(stats)
+            return
 
-        # Calculate smoothness for each ramp
-        ramp_scores = [(ramp, self.evaluate_ramp_quality(ramp)['final_score']) for ramp in ramps]
-
-        # Filter results
-        if skip_subsequences:
-            ramp_scores = self._remove_subsequences(ramp_scores)
-
-        if skip_permutations:
-            ramp_scores = self._remove_permutations(ramp_scores)
-
-        if skip_reverse and not skip_permutations:
-            ramp_scores = self._remove_reverses(ramp_scores)
+        # Candidates are shown while the search runs, so start from an empty list
+        self.ramps_model.set_ramps([])
+        self.generated_ramps = []
+        self.ramp_stream_filter = core.StreamingRampFilter(options['skip_subsequences'], options['skip_reverse'])
 
-        final_ramps = [ramp for ramp, _ in ramp_scores]
-        if len(final_ramps) > 2 and remove_similar:
-            final_ramps = self.remove_similar_ramps(final_ramps)
+        # Filled in by the worker thread, only read once the task has stopped
+        self.extraction_stats = stats
+        self.extraction_task = BackgroundTask(
+            lambda progress, publish: core.run_extraction(
+                graph, colors, method, params, progress=progress, publish=publish, stats=stats, **options
+            )
+        )
+        self.extraction_task.progress.connect(self.update_progress)
+        self.extraction_task.partial_results.connect(self._on_ramps_found)
+        self.extraction_task.finished.connect(self._on_extraction_finished)
+        self.extraction_task.cancelled.connect(self._on_extraction_cancelled)
+        self.extraction_task.failed.connect(self._on_extraction_failed)
+
+        overlay = self._progress_overlay()
+        if overlay:
+            overlay.set_cancellable(True)
+            overlay.set_docked(True)
+            overlay.cancel_requested.connect(self.cancel_extraction)
 
+        self.extract_button.setDisabled(True)
+        self.update_progress("Extracting Ramps...", 0, 0)
+        self.extraction_task.start()
+
+    def _on_extraction_finished(self, result):
+        final_ramps, clusters, budget = result
+        self._on_extraction_stopped()
+        # A search cut short by its budget is not the full answer to the request
+        if budget.stop_reason is None:
+            self.extraction_cache.put(self.extraction_cache_key, final_ramps, clusters)
+        if clusters is not None:
+            self.show_ramp_clusters(*clusters)
         self.display_color_ramps(final_ramps)
+        if budget.stop_reason:
+            self.ramp_label.setText(
+                f"Candidate Ramps ({budget.stop_reason} reached, "
+                f"{budget.covered * 100:.3g}% of the search space covered)"
+            )
 
-    @staticmethod
-    def _remove_subsequences(ramp_scores):
-        # Sort by score (descending) and length (descending) for stable results
-        ramp_scores.sort(key=lambda x: (-x[1], -len(x[0])))
-        filtered_scores = []
-        all_ramps = [r for r, _ in ramp_scores]  # Keep all ramps for checking
+    def _on_ramps_found(self, ramps):
+        # Ramps kept and superseded within the same batch never reach the model
+        added = {}
+        removed = set()
+        for ramp in ramps:
+            kept, superseded = self.ramp_stream_filter.add(ramp)
+            for key in superseded:
+                if added.pop(key, None) is None:
+                    removed.add(key)
+            if kept:
+                added[tuple(ramp)] = ramp
+
+        self.ramps_model.remove_ramps(removed)
+        self.ramps_model.append_ramps(list(added.values()))
+        self.update_duplicates()
 
-        for i, (ramp, score) in enumerate(ramp_scores):
-            # Create list of all other ramps (excluding current one)
-            other_ramps = all_ramps[:i] + all_ramps[i + 1:]
-            # Only keep ramp if it's not a subsequence of any other ramp
-            if not RampExtractionViewer.is_subsequence_of_any(ramp, other_ramps):
-                filtered_scores.append((ramp, score))
+        self.generated_ramps = list(self.ramp_stream_filter.ramps.values())
+        self.ramp_label.setText(f"Candidate Ramps ({len(self.generated_ramps)} found so far)")
 
-        return filtered_scores
+    def _on_extraction_cancelled(self):
+        self._on_extraction_stopped()
+        self.ramp_label.setText(f"Candidate Ramps ({len(self.generated_ramps)} found before cancelling)")
 
-    @staticmethod
-    def _remove_reverses(ramp_scores):
-        # Group ramps with their reverses
-        processed = set()
-        filtered_scores = []
-        for ramp, score in ramp_scores:
-            if tuple(ramp) in processed:
-                continue
-
-            reverse = tuple(reversed(ramp))
-            processed.add(tuple(ramp))
-            processed.add(reverse)
-
-            # Find scores for both original and reverse
-            reverse_score = next((s for r, s in ramp_scores if tuple(r) == reverse), None)
-            if reverse_score is not None:
-                # Keep the better scoring version
-                if score >= reverse_score:
-                    filtered_scores.append((ramp, score))
-                else:
-                    filtered_scores.append((list(reverse), reverse_score))
-            else:
-                filtered_scores.append((ramp, score))
-        ramp_scores = filtered_scores
-        return ramp_scores
+    def _on_extraction_failed(self, message):
+        self._on_extraction_stopped()
+        QMessageBox.critical(self, "Extraction Error", f"Failed to extract color ramps: {message}")
 
-    @staticmethod
-    def _remove_permutations(ramp_scores):
-        # Group ramps by their set of colors
-        perm_groups = {}
-        for ramp, score in ramp_scores:
-            color_set = frozenset(ramp)
-            if color_set not in perm_groups:
-                perm_groups[color_set] = []
-            perm_groups[color_set].append((ramp, score))
-        # Keep only the best scoring ramp from each permutation group
-        ramp_scores = [max(group, key=lambda x: x[1])
-                       for group in perm_groups.values()]
-        return ramp_scores
+    def cancel_extraction(self):
+        if self.extraction_task is not None:
+            self.extraction_task.cancel()
+
+    def _on_extraction_stopped(self):
+        if self.extraction_task is None:
+            return
+        overlay = self._progress_overlay()
+        if overlay:
+            overlay.cancel_requested.disconnect(self.cancel_extraction)
+        self.extraction_task.wait()
+        self.extraction_task = None
+        self.finish_progress()
+        self.update_extract_button_state()
+        self.stats_updated.emit(self.extraction_stats)
 
     def _get_extraction_params(self, method):
         if method == "Basic HSV":
@@ -539,21 +579,10 @@ class RampExtractionViewer(QWidget):
         return {}
 
     def display_color_ramps(self, ramps):
-        print("Candidate Ramps:", len(ramps))
-
+        self.ramp_label.setText("Candidate Ramps")
         self.generated_ramps = ramps
-        self.clear_layout(self.ramps_layout)
-        self.generated_ramp_widgets.clear()
-
-        for ramp in ramps:
-            widget = ColorRamp(ramp, source="generated")
-            widget.duplicated = ramp in global_ramp_manager.get_ramps()
-            widget.update_highlight()
-            self.generated_ramp_widgets[tuple(ramp)] = widget
-            self.ramps_layout.addWidget(widget)
-
+        self.ramps_model.set_ramps(ramps)
         self.update_duplicates()
-        self.finish_progress()
 
     def request_ramp_update(self, old_ramp, new_ramp):
         old_key = tuple(old_ramp)
@@ -615,15 +644,13 @@ class RampExtractionViewer(QWidget):
 
 
     def update_duplicates(self):
-        generated_keys = set(self.generated_ramp_widgets.keys())
+        generated_keys = set(self.ramps_model.keys())
         final_keys = set(self.final_ramp_widgets.keys())
 
         shared = generated_keys & final_keys
 
         # Update generated
-        for key, widget in self.generated_ramp_widgets.items():
-            widget.duplicated = key in shared
-            widget.update_highlight()
+        self.ramps_model.set_duplicates(shared)
 
         # Update final
         for key, widget in self.final_ramp_widgets.items():
@@ -637,388 +664,6 @@ class RampExtractionViewer(QWidget):
             if child.widget():
                 child.widget().deleteLater()
 
-    def find_color_ramps(self, graph, method="Basic HSV", params=None, max_length=20):
-        if params is None:
-            params = {}
-
-        ramps = []
-        sorted_nodes = sorted(
-            graph.nodes,
-            key=lambda color_id: color_to_hsv(global_color_manager.color_groups[color_id].current_color)[2]
-        )
-        n = len(sorted_nodes)
-
-        i = 0
-        for start in sorted_nodes:
-            self.update_progress("Extracting Ramps...", i, n)
-            i += 1
-
-            stack = [(start, [start])]
-            while stack:
-                current, path = stack.pop()
-
-                if len(path) == max_length:
-                    extended = False
-                else:
-                    extended = False
-                    for neighbor in graph.neighbors(current):
-                        if neighbor in path:
-                            continue
-                        new_path = path + [neighbor]
-                        if len(new_path) > max_length:
-                            continue
-                        if RampExtractionViewer.is_valid_ramp(new_path, method, params):
-                            stack.append((neighbor, new_path))
-                            extended = True
-
-                if not extended and len(path) >= 3:
-                    ramps.append(path)
-
-        return ramps
-
-    @staticmethod
-    def is_valid_ramp(path, method, params):
-        colors = [global_color_manager.color_groups[color_id].current_color for color_id in path]
-
-        if method == "Basic HSV":
-            return RampExtractionViewer._is_valid_ramp_hsv(colors, params)
-        elif method == "CIEDE2000":
-            return RampExtractionViewer.is_valid_ramp_ciede2000(colors, params)
-
-        return False
-
-    @staticmethod
-    def _is_valid_ramp_hsv(colors, params):
-
-        # Get differences using existing function
-        diffs = hsv_diffs(colors)
-
-        # For each component (H, S, V)
-        for idx in range(3):
-            component_diffs = diffs[:, idx]
-
-            # Check step sizes
-            steps = np.abs(component_diffs)
-            if np.any(steps < params['min_step'][idx]):
-                return False
-            if np.any(steps > params['max_step'][idx]):
-                return False
-
-            # Check step size consistency
-            if len(steps) > 1:
-                step_differences = np.abs(steps[1:] - steps[:-1])
-                if np.any(step_differences > params['step_tolerance'][idx]):
-                    return False
-
-            # Check monotonicity if required
-            if params['strict_monotony'][idx]:
-                signs = np.sign(component_diffs)
-                if not (np.all(signs >= 0) or np.all(signs <= 0)):
-                    return False
-
-        return True
-
-    @staticmethod
-    def is_valid_ramp_ciede2000(colors, params):
-        # Convert RGB to Lab for all colors in the path
-        lab_colors = []
-        for color in colors:
-            srgb = sRGBColor(*[c / 255.0 for c in color[:3]])
-            lab = convert_color(srgb, LabColor)
-            lab_colors.append((lab.lab_l, lab.lab_a, lab.lab_b))
-        lab_array = np.array(lab_colors)
-
-        # Calculate vectors between consecutive colors
-        vectors = np.diff(lab_array, axis=0)  # Shape: (n-1, 3)
-
-        # Calculate CIEDE2000 differences between consecutive colors
-        delta_e_steps = []
-        for i in range(len(lab_colors) - 1):
-            delta_e = ciede2000(lab_colors[i], lab_colors[i + 1])['delta_E_00']
-            delta_e_steps.append(delta_e)
-
-        delta_e_steps = np.array(delta_e_steps)
-
-        # Check min/max step sizes
-        if np.any(delta_e_steps < params['min_step']) or np.any(delta_e_steps > params['max_step']):
-            return False
-
-        # Check step consistency
-        if len(delta_e_steps) > 1:
-            step_differences = np.abs(delta_e_steps[1:] - delta_e_steps[:-1])
-            if np.any(step_differences > params['step_tolerance']):
-                return False
-
-        # Check direction consistency in LCH space
-        for i in range(len(vectors) - 1):
-            v1 = vectors[i]
-            v2 = vectors[i + 1]
-
-            norm_v1: float = float(np.linalg.norm(v1))
-            norm_v2: float = float(np.linalg.norm(v2))
-
-            if norm_v1 == 0.0 or norm_v2 == 0.0:
-                continue
-
-            cos_angle = np.dot(v1, v2) / (norm_v1 * norm_v2)
-            angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
-            angle_deg = np.degrees(angle)
-
-            if angle_deg > params['angle_tolerance']:
-                return False
-
-        return True
-
-    @staticmethod
-    def is_monotonic_direction(deltas):
-        # Ignore near-zero steps to prevent noise triggering false negatives
-        non_zero = deltas[np.abs(deltas) > 0.05]
-        if len(non_zero) == 0:
-            return True
-        return np.all(non_zero >= 0) or np.all(non_zero <= 0)
-
-    @staticmethod
-    def is_monotonic_delta_e(delta_e_steps, tolerance=1):
-        diffs = np.diff(delta_e_steps)
-        non_zero_diffs = diffs[np.abs(diffs) > tolerance]
-        if len(non_zero_diffs) == 0:
-            return True  # Flat ΔE changes, accept as monotonic
-        return np.all(non_zero_diffs >= 0) or np.all(non_zero_diffs <= 0)
-
-    @staticmethod
-    def is_consistent_step_size(deltas, tolerance):
-        non_zero = deltas[np.abs(deltas) > 0.001]
-        if len(non_zero) < 2:
-            return True
-        step_diffs = np.diff(non_zero)
-        return np.all(np.abs(step_diffs) <= tolerance)
-
-    @staticmethod
-    def is_subsequence_of_any(candidate, ramps):
-        candidate_length = len(candidate)
-        reversed_candidate = list(reversed(candidate))
-
-        for ramp in ramps:
-            ramp_length = len(ramp)
-            if ramp_length <= candidate_length:
-                continue
-            for i in range(ramp_length - candidate_length + 1):
-                if ramp[i:i + candidate_length] == candidate or ramp[i:i + candidate_length] == reversed_candidate:
-                ## if ramp[i:i + candidate_length] == candidate:
-                    return True
-        return False
-
-    def remove_similar_ramps(self, ramps, distance_threshold=2):
-        if not ramps:
-            return ramps
-
-        n = len(ramps)
-        total_pairs = (n * (n - 1)) // 2
-        pair_count = 0
-        distance_matrix = np.zeros((n, n))
-
-        for i in range(n):
-            for j in range(i + 1, n):
-                pair_count += 1
-                self.update_progress("Computing Distances...", pair_count, total_pairs)
-                dist = RampExtractionViewer.ramp_edit_distance(ramps[i], ramps[j])
-                distance_matrix[i, j] = dist
-                distance_matrix[j, i] = dist
-
-        self.update_progress("Clustering...", 0, 0)
-        clustering = AgglomerativeClustering(
-            metric='precomputed',
-            linkage='average',
-            distance_threshold=distance_threshold,
-            n_clusters=None
-        )
-        clustering.fit(distance_matrix)
-        labels = clustering.labels_
-
-        self.show_ramp_clusters(ramps, labels)
-
-        # Select the best ramp from each cluster
-        final_ramps = []
-        for label in np.unique(labels):
-            indices = np.where(labels == label)[0]
-            candidate_ramps = [ramps[i] for i in indices]
-            best_ramp = RampExtractionViewer.select_best_ramp(candidate_ramps)
-            final_ramps.append(best_ramp)
-
-        # Sort final ramps by brightness of the first color (V in HSV)
-        final_ramps.sort(key=lambda r: color_to_hsv(r[0])[2])
-
-        return final_ramps
-
-    @staticmethod
-    def ramp_edit_distance(r1, r2, similarity_threshold=10, swap_cost=0.5, insertion_cost=1.0, substitution_cost=1.0, permutation_cost=0.0):
-
-        # Convert color IDs to actual colors
-        r1_colors = [global_color_manager.color_groups[color_id].current_color for color_id in r1]
-        r2_colors = [global_color_manager.color_groups[color_id].current_color for color_id in r2]
-
-        # Quick check: same colors, just reordered
-        if set(r1) == set(r2):
-            return permutation_cost
-
-        len_r1, len_r2 = len(r1), len(r2)
-        dp = np.zeros((len_r1 + 1, len_r2 + 1))
-
-        for i in range(len_r1 + 1):
-            dp[i][0] = i * insertion_cost
-        for j in range(len_r2 + 1):
-            dp[0][j] = j * insertion_cost
-
-        for i in range(1, len_r1 + 1):
-            for j in range(1, len_r2 + 1):
-                c1, c2 = r1_colors[i - 1], r2_colors[j - 1]
-
-                if is_similar_ciede2000(c1, c2, similarity_threshold):
-                    subst_cost = 0
-                else:
-                    subst_cost = substitution_cost
-
-                dp[i][j] = np.min([
-                    dp[i - 1][j] + insertion_cost,
-                    dp[i][j - 1] + insertion_cost,
-                    dp[i - 1][j - 1] + subst_cost
-                ])
-
-                # Handle adjacent swaps (Damerau-Levenshtein)
-                if i > 1 and j > 1 and r1[i - 1] == r2[j - 2] and r1[i - 2] == r2[j - 1]:
-                    dp[i, j] = min(float(dp[i, j]), float(dp[i - 2, j - 2] + swap_cost))
-
-        return dp[len_r1][len_r2]
-
-    @staticmethod
-    def select_best_ramp(ramps):
-        best_score = -np.inf
-        best_ramp = ramps[0]
-
-        ramp_lengths = [len(r) for r in ramps]
-
-        for ramp in ramps:
-            score_info = RampExtractionViewer.evaluate_ramp_quality(ramp, min(ramp_lengths))
-            score = score_info['final_score']
-            if score > best_score:
-                best_score = score
-                best_ramp = ramp
-
-
-        return best_ramp
-
-    @staticmethod
-    def evaluate_ramp_quality(ramp, min_length=3):
-
-        if len(ramp) < 2:
-            return 0.0, {"message": "Ramp too short"}
-
-        # Convert color IDs to actual colors if needed
-        colors = []
-        for color in ramp:
-            if isinstance(color, int):
-                # Get actual color from global color manager via color_utils
-                colors.append(global_managers.global_color_manager.color_groups[color].current_color)
-            else:
-                colors.append(color)
-
-
-        # Calculate CIEDE2000 differences between consecutive colors
-        steps = []
-        for i in range(len(colors) - 1):
-            color1 = colors[i]
-            color2 = colors[i + 1]
-
-            srgb1 = sRGBColor(*[x / 255.0 for x in color1[:3]])
-            srgb2 = sRGBColor(*[x / 255.0 for x in color2[:3]])
-            lab1 = convert_color(srgb1, LabColor)
-            lab2 = convert_color(srgb2, LabColor)
-
-            delta_e = ciede2000(
-                (lab1.lab_l, lab1.lab_a, lab1.lab_b),
-                (lab2.lab_l, lab2.lab_a, lab2.lab_b)
-            )['delta_E_00']
-
-            steps.append(delta_e)
-
-        # 1. Step size penalties
-        step_penalties = []
-        for step in steps:
-            if step < 10:
-                penalty = ((10 - step) / 10.0) ** 2
-
-            elif step > 50:
-                penalty = (step / 50.0) ** 2
-
-            else:
-                penalty = 0
-            step_penalties.append(penalty)
-
-        step_size_penalty = (np.sqrt(np.mean(np.array(step_penalties)))) if step_penalties else 0.0
-
-        # 2. Step consistency penalties
-        consistency_penalties = []
-        for i in range(len(steps) - 1):
-            diff = abs(steps[i] - steps[i + 1])
-            penalty = (diff / 10) ** 2
-            consistency_penalties.append(penalty)
-
-        step_consistency_penalty = (np.sqrt(np.mean(np.array(consistency_penalties)))) if consistency_penalties else 0.0
-
-        # 3. Monotony bonus using HSV
-        diffs = hsv_diffs(colors)
-
-        # Get individual scores for each component
-        hue_score = RampExtractionViewer.get_monotony_score(diffs[:, 0])
-        sat_score = RampExtractionViewer.get_monotony_score(diffs[:, 1])
-        val_score = RampExtractionViewer.get_monotony_score(diffs[:, 2])
-
-        monotony_score = (hue_score + sat_score + val_score)
-
-        # 4. Length bonus compared to min length in the group
-        length_bonus = (len(colors) - min_length)
-
-        step_size_penalty = step_size_penalty * 1
-        step_consistency_penalty = step_consistency_penalty * 1
-        monotony_score = monotony_score * 1
-        length_bonus = length_bonus * 0.05
-
-        final_score = monotony_score + length_bonus - step_size_penalty - step_consistency_penalty
-
-        return {
-            'step_size_penalty': step_size_penalty,
-            'step_consistency_penalty': step_consistency_penalty,
-            'monotony_score': monotony_score,
-            'length_bonus': length_bonus,
-            'final_score': final_score
-        }
-
-    @staticmethod
-    def count_direction_changes(diffs):
-        if len(diffs) < 2:
-            return 0
-
-        # Ignore very small changes to prevent noise
-        significant_diffs = diffs[np.abs(diffs) > 0.05]
-
-        if len(significant_diffs) < 2:
-            return 0
-
-        # Get signs of differences (+1 for positive, -1 for negative)
-        signs = np.sign(significant_diffs)
-
-        # Count how many times the sign changes
-        direction_changes = np.sum(np.abs(np.diff(signs)) == 2)  # diff of +1 to -1 or vice versa is 2
-
-        return direction_changes
-
-    @staticmethod
-    def get_monotony_score(diffs):
-        changes = RampExtractionViewer.count_direction_changes(diffs)
-        if changes > 2:
-            return 0
-        return 1.0 / (changes + 1)
-
     def show_ramp_clusters(self, ramps, labels):
         dialog = QDialog(self)
         dialog.setWindowTitle("Ramp Clusters")
@@ -1041,7 +686,11 @@ class RampExtractionViewer(QWidget):
             ramp_lengths = [len(r) for r in candidate_ramps]
 
             # Compute goodness scores and factors
-            results = [self.evaluate_ramp_quality(ramp, min(ramp_lengths)) for ramp in candidate_ramps]
+            colors = global_color_manager.get_colors()
+            results = [
+                core.evaluate_ramp_quality([colors[color_id] for color_id in ramp], min(ramp_lengths))
+                for ramp in candidate_ramps
+            ]
 
             # Create pairs of (ramp, score) and sort by score
             ramp_score_pairs = list(zip(candidate_ramps, results))
@@ -1112,15 +761,18 @@ class RampExtractionViewer(QWidget):
         dialog_layout.addWidget(scroll)
         dialog.exec()
 
+    def _progress_overlay(self):
+        return getattr(self.window(), 'progress_overlay', None)
+
     def update_progress(self, message, value, maximum):
-        parent_window = self.window()
-        if hasattr(parent_window, 'progress_overlay'):
-            parent_window.progress_overlay.update_progress(message, value, maximum)
+        overlay = self._progress_overlay()
+        if overlay:
+            overlay.update_progress(message, value, maximum)
 
     def finish_progress(self):
-        parent_window = self.window()
-        if hasattr(parent_window, 'progress_overlay'):
-            parent_window.progress_overlay.finish()
+        overlay = self._progress_overlay()
+        if overlay:
+            overlay.finish()
 
     def tool_active(self, name):
         return {
@@ -1158,9 +810,13 @@ class RampExtractionViewer(QWidget):
 
     def cleanup(self):
         try:
-            self.clear_layout(self.ramps_layout)
+            if self.extraction_task is not None:
+                # Closing must not block on a stage that is still running
+                self.extraction_task.abandon()
+                self.extraction_task = None
+            self.ramps_model.set_ramps([])
+            self.ramps_view.cleanup()
             self.clear_layout(self.final_ramps_layout)
-            self.generated_ramp_widgets.clear()
             self.final_ramp_widgets.clear()
             self.unused_palette.clear()
             global_ramp_manager.unregister_listener(self.refresh_ramp_views)
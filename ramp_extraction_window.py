@@ -3,13 +3,13 @@ from PyQt6.QtCore import Qt, pyqtSignal
 from graph_viewer import GraphViewer
 from image_viewer import ImageViewer
 from ramp_extraction_viewer import RampExtractionViewer
-from ui_helpers import ProgressOverlay
+from ui_helpers import ProgressOverlay, StatsPanel
 
 
 class RampWindow(QWidget):
     ramps_saved = pyqtSignal()
 
-    def __init__(self, loaded_pixmap):
+    def __init__(self, palette, durations=None):
         super().__init__()
         self.setWindowTitle("Color Ramp Extraction")
         self.resize(1600, 900)
@@ -20,8 +20,9 @@ class RampWindow(QWidget):
 
         # Top-Left: Image
         self.mini_viewer = ImageViewer(show_load_button=False, palette_square_size=25)
-        self.mini_viewer.load_image(pixmap=loaded_pixmap)
-        unique_colors = self.mini_viewer.color_palette.labels.keys()
+        # The palette of the main view, every frame and the same color ids
+        self.mini_viewer.load_image(palette=palette, durations=durations)
+        unique_colors = self.mini_viewer.color_palette.color_ids()
         layout.addWidget(self.mini_viewer, 0, 0)
 
         # Top-Right: Graph Extraction
@@ -33,6 +34,14 @@ class RampWindow(QWidget):
         self.graph_viewer.graph_updated.connect(self.ramp_extraction_widget.update_extract_button_state)
         layout.addWidget(self.ramp_extraction_widget, 1, 0, 1, 2)
 
+        # Bottom: Timings and counters of the last graph and extraction
+        self.stats_panel = StatsPanel("Stats")
+        self.graph_viewer.graph_updated.connect(
+            lambda: self.stats_panel.update_stats(self.graph_viewer.graph_stats)
+        )
+        self.ramp_extraction_widget.stats_updated.connect(self.stats_panel.update_stats)
+        layout.addWidget(self.stats_panel, 2, 0, 1, 2)
+
         # Ensure all grid cells are equal
         layout.setRowStretch(0, 1)
         layout.setRowStretch(1, 1)
@@ -54,4 +63,4 @@ class RampWindow(QWidget):
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.progress_overlay.setGeometry(self.rect())
+        self.progress_overlay.fit_to_parent()
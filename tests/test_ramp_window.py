@@ -0,0 +1,50 @@
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import pytest
+from PyQt6.QtWidgets import QApplication
+
+import core
+from global_managers import global_color_manager
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def animation_path(tmp_path):
+    # 5 colors over 3 frames; the last frame only uses ids 0, 3 and 4
+    colors = [(255, 0, 0, 255), (0, 255, 0, 255), (0, 0, 255, 255), (255, 255, 0, 255), (0, 255, 255, 255)]
+    frames = np.zeros((3, 16, 16), dtype=np.int32)
+    frames[0, :, 8:] = 1
+    frames[1] = 2
+    frames[2, :8, 8:] = 3
+    frames[2, 8:] = 4
+    path = str(tmp_path / "animation.gif")
+    core.save_animation(path, frames, colors, [100, 100, 100])
+    return path
+
+
+def test_ramp_window_keeps_every_frame(app, animation_path):
+    from main_window import MainWindow
+
+    window = MainWindow()
+    window.viewer.load_image(file_path=animation_path)
+    window.viewer.show_frame(2)
+    colors = global_color_manager.get_colors()
+    frames = global_color_manager.frames.copy()
+
+    window.open_ramp_window()
+    try:
+        assert global_color_manager.get_colors() == colors
+        assert np.array_equal(global_color_manager.frames, frames)
+        assert global_color_manager.frames.shape == (3, 16, 16)
+        assert set(np.unique(window.viewer.label_map)) <= set(colors)
+        assert np.array_equal(window.ramp_window.mini_viewer.frames, frames)
+    finally:
+        window.ramp_window.close()
+        window.close()
@@ -1,3 +1,8 @@
+import os
+import threading
+import traceback
+from time import monotonic
+
 from PyQt6.QtGui import QPainter
 from PyQt6.QtWidgets import QLayout, QSizePolicy, QWidgetItem, QLabel
 from PyQt6.QtCore import QSize, Qt, QRect, QPoint
@@ -92,12 +97,132 @@ class VerticalLabel(QLabel):
         return QSize(text_height, text_width)  # Swapped due to rotation
 
 
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QProgressBar, QApplication
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar, QPushButton, QToolButton, QFileDialog
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class BackgroundTask(QObject):
+    """
+    Runs `fn(progress, publish)` on its own thread and reports back through queued signals.
+
+    `progress(message, value, maximum)` forwards at most `max_rate` updates per second
+    (stage changes and completion always go through) and raises TaskCancelled once
+    cancel() has been called, which unwinds `fn` at its next progress report.
+    `publish(item)` queues a partial result; queued items are delivered in batches
+    through `partial_results` at most every `batch_interval` seconds. Progress reports
+    also deliver them once they are due, and right away when the stage changes, so the
+    last items of a stage don't wait for the next publish; whatever is left is flushed
+    before the task finishes or is cancelled.
+    """
+    progress = pyqtSignal(str, int, int)
+    partial_results = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    # Tasks let go of while still running, kept referenced until their thread ends
+    _abandoned = set()
+
+    def __init__(self, fn, max_rate=30, batch_interval=0.2):
+        super().__init__()
+        self._fn = fn
+        self._min_interval = 1.0 / max_rate
+        self._batch_interval = batch_interval
+        self._last_report = 0.0
+        self._last_message = None
+        self._last_publish = 0.0
+        self._pending = []
+        self._cancel_event = threading.Event()
+
+        self._home_thread = QThread.currentThread()
+        self._thread = QThread()
+        self.moveToThread(self._thread)
+        self._thread.started.connect(self._run)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_running(self):
+        return self._thread.isRunning()
+
+    def wait(self):
+        self._thread.wait()
+
+    def abandon(self):
+        """
+        Cancel without waiting for the thread: nothing is delivered anymore and the
+        task winds down on its own at its next progress report.
+        """
+        self.cancel()
+        for signal in (self.progress, self.partial_results, self.finished, self.failed, self.cancelled):
+            try:
+                signal.disconnect()
+            except TypeError:
+                pass  # nothing connected
+        BackgroundTask._abandoned = {task for task in BackgroundTask._abandoned if task.is_running()}
+        if self.is_running():
+            BackgroundTask._abandoned.add(self)
+
+    def _report(self, message, value, maximum):
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+
+        now = monotonic()
+        if self._pending and (message != self._last_message or now - self._last_publish >= self._batch_interval):
+            self._flush()
+        if message != self._last_message or value >= maximum or now - self._last_report >= self._min_interval:
+            self._last_message = message
+            self._last_report = now
+            self.progress.emit(message, value, maximum)
+
+    def _publish(self, item):
+        self._pending.append(item)
+        if monotonic() - self._last_publish >= self._batch_interval:
+            self._flush()
+
+    def _flush(self):
+        self._last_publish = monotonic()
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self.partial_results.emit(batch)
+
+    def _run(self):
+        try:
+            result = self._fn(self._report, self._publish)
+        except TaskCancelled:
+            self._flush()
+            self.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(str(e))
+        else:
+            self._flush()
+            self.finished.emit(result)
+        finally:
+            self.moveToThread(self._home_thread)
+            self._thread.quit()
+
 
 class ProgressOverlay(QWidget):
+    """
+    Dims the parent while work is in progress. When docked, it shrinks to a strip along
+    the top edge so the rest of the window stays usable.
+    """
+    cancel_requested = pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.docked = False
         self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground, True)
         self.setStyleSheet("background-color: rgba(0, 0, 0, 160);")
         self.setGeometry(parent.rect())
@@ -110,17 +235,118 @@ class ProgressOverlay(QWidget):
         self.progress_bar = QProgressBar()
         self.progress_bar.setFixedWidth(400)
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setStyleSheet("background-color: #eeeeee; padding: 4px 16px;")
+        self.cancel_button.clicked.connect(self._request_cancel)
+        self.cancel_button.hide()
+
         layout.addWidget(self.message_label)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.cancel_button, alignment=Qt.AlignmentFlag.AlignCenter)
         self.hide()
 
+    def set_cancellable(self, cancellable):
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setVisible(cancellable)
+
+    def set_docked(self, docked):
+        self.docked = docked
+        self.fit_to_parent()
+
+    def fit_to_parent(self):
+        rect = self.parentWidget().rect()
+        if self.docked:
+            rect.setHeight(self.sizeHint().height())
+        self.setGeometry(rect)
+
+    def _request_cancel(self):
+        self.message_label.setText("Cancelling...")
+        self.cancel_button.setEnabled(False)
+        self.cancel_requested.emit()
+
     def update_progress(self, message, value, maximum):
+        if not self.cancel_button.isEnabled():
+            return
         self.message_label.setText(message)
         self.progress_bar.setMaximum(maximum)
         self.progress_bar.setValue(value)
         if not self.isVisible():
+            self.fit_to_parent()
             self.show()
-        QApplication.processEvents()
+            self.raise_()
 
     def finish(self):
         self.hide()
+        self.set_cancellable(False)
+        self.docked = False
+
+
+class StatsPanel(QWidget):
+    """
+    Collapsible view of the latest `core.Stats` of each kind (graph, extraction).
+    With a log file chosen, every update is also appended to it as one JSON line.
+    """
+
+    def __init__(self, title="Stats", parent=None):
+        super().__init__(parent)
+        self.stats = {}
+        self.log_path = None
+        self.log_error = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
+
+        header = QHBoxLayout()
+        self.toggle_button = QToolButton()
+        self.toggle_button.setText(title)
+        self.toggle_button.setCheckable(True)
+        self.toggle_button.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonTextBesideIcon)
+        self.toggle_button.setArrowType(Qt.ArrowType.RightArrow)
+        self.toggle_button.setStyleSheet("QToolButton { border: none; font-weight: bold; }")
+        self.toggle_button.toggled.connect(self.set_expanded)
+        header.addWidget(self.toggle_button)
+        header.addStretch()
+
+        self.log_button = QPushButton("Log to JSON...")
+        self.log_button.clicked.connect(self.choose_log_file)
+        self.log_button.hide()
+        header.addWidget(self.log_button)
+        layout.addLayout(header)
+
+        self.text_label = QLabel("No runs yet")
+        self.text_label.setStyleSheet("font-family: monospace;")
+        self.text_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.text_label.hide()
+        layout.addWidget(self.text_label)
+
+    def set_expanded(self, expanded):
+        self.toggle_button.setArrowType(Qt.ArrowType.DownArrow if expanded else Qt.ArrowType.RightArrow)
+        self.text_label.setVisible(expanded)
+        self.log_button.setVisible(expanded)
+
+    def choose_log_file(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Log Stats", "stats.jsonl", "JSON Lines (*.jsonl *.json)")
+        if path:
+            self.log_path = path
+            self.log_error = None
+            self.log_button.setText(f"Logging to {os.path.basename(path)}")
+
+    def update_stats(self, stats):
+        if stats is None:
+            return
+        self.stats[stats.name] = stats
+
+        if self.log_path:
+            try:
+                stats.append_json(self.log_path)
+            except OSError as e:
+                # Stop logging rather than fail on every update; the error stays shown until another file is chosen
+                self.log_error = f"Logging stopped, failed to write {self.log_path}: {e}"
+                self.log_path = None
+                self.log_button.setText("Log to JSON...")
+
+        sections = [f"[{name}]\n{s.format()}" for name, s in self.stats.items()]
+        if self.log_error:
+            sections.append(self.log_error)
+        self.text_label.setText("\n\n".join(sections))